@@ -4,6 +4,7 @@ from pathlib import Path
 
 from ua_help.common import log
 from ua_help.localize.language import Language
+from ua_help.telegram.sharding import shard_path
 
 
 class StudentTelegramFormConfig:
@@ -30,3 +31,77 @@ class StudentTelegramFormConfig:
         self.fill_instructions = resources / raw_json['fill_instructions']
         self.host_url = raw_json['host_url']
         self.use_webhook = raw_json['use_webhook']
+        self.webhook_listen = raw_json.get('webhook_listen', '127.0.0.1')
+        self.webhook_port = int(raw_json.get('webhook_port', 80))
+        self.webhook_queue_size = int(raw_json.get('webhook_queue_size', 1000))
+        self.webhook_stats_interval = float(raw_json.get('webhook_stats_interval', 60.0))
+        self.sheet_batch_size = int(raw_json.get('sheet_batch_size', 50))
+        self.sheet_flush_interval = float(raw_json.get('sheet_flush_interval', 2.0))
+        self.sheet_writes_per_minute = int(raw_json.get('sheet_writes_per_minute', 60))
+        self.sheet_breaker_threshold = int(raw_json.get('sheet_breaker_threshold', 5))
+        self.sheet_breaker_timeout = float(raw_json.get('sheet_breaker_timeout', 60.0))
+        self.sheet_max_rows = raw_json.get('sheet_max_rows')
+        self.sheet_max_cells = raw_json.get('sheet_max_cells')
+        self.sheet_shard_key = raw_json.get('sheet_shard_key')
+        self.sheet_outbox = Path(raw_json.get('sheet_outbox', str(self.clients_data / 'sheet_outbox.sqlite3')))
+        if not self.sheet_outbox.is_absolute():
+            raise Exception('Sheet outbox path must be absolute')
+        self.sheet_rollover_lock = Path(raw_json.get(
+            'sheet_rollover_lock',
+            str(self.clients_data / 'sheet_rollover.lock')
+        ))
+        self.sheet_reconcile_on_start = bool(raw_json.get('sheet_reconcile_on_start', True))
+        self.sheet_status_column = raw_json.get('sheet_status_column')
+        self.sheet_status_poll_interval = float(raw_json.get('sheet_status_poll_interval', 60.0))
+        self.sheet_status_index = Path(raw_json.get(
+            'sheet_status_index',
+            str(self.clients_data / 'sheet_status_index.sqlite3')
+        ))
+        self.results_db = Path(raw_json.get('results_db', str(self.clients_data / 'results.sqlite3')))
+        if not self.results_db.is_absolute():
+            raise Exception('Results database path must be absolute')
+        self.results_jsonl_folder = None if raw_json.get('results_jsonl_folder') is None \
+            else Path(raw_json['results_jsonl_folder'])
+        self.results_csv_folder = None if raw_json.get('results_csv_folder') is None \
+            else Path(raw_json['results_csv_folder'])
+        self.results_rotate_bytes = int(raw_json.get('results_rotate_bytes', 16 * 1024 * 1024))
+        self.send_global_rate = float(raw_json.get('send_global_rate', 30.0))
+        self.send_per_chat_rate = float(raw_json.get('send_per_chat_rate', 1.0))
+        self.send_per_chat_burst = float(raw_json.get('send_per_chat_burst', 3.0))
+        self.send_bulk_reserve = float(raw_json.get('send_bulk_reserve', 10.0))
+        self.callback_toast = raw_json.get('callback_toast')
+        self.outbound_db = Path(raw_json.get('outbound_db', str(self.clients_data / 'outbound.sqlite3')))
+        if not self.outbound_db.is_absolute():
+            raise Exception('Outbound database path must be absolute')
+        self.outbound_workers = int(raw_json.get('outbound_workers', 4))
+        self.telegram_pool_size = int(raw_json.get('telegram_pool_size', 8 + self.outbound_workers))
+        self.telegram_connect_timeout = float(raw_json.get('telegram_connect_timeout', 5.0))
+        self.telegram_read_timeout = float(raw_json.get('telegram_read_timeout', 5.0))
+        self.telegram_keep_alive_idle = raw_json.get('telegram_keep_alive_idle', 120)
+        self.telegram_pool_block = bool(raw_json.get('telegram_pool_block', True))
+        self.runtime = raw_json.get('runtime', 'threaded')
+        if self.runtime not in ('threaded', 'pooled', 'asyncio'):
+            raise Exception(f'Unknown runtime: {self.runtime}')
+        self.async_executor_workers = int(raw_json.get('async_executor_workers', 8))
+        self.async_io_workers = int(raw_json.get('async_io_workers', 8))
+        self.dispatch_workers = int(raw_json.get('dispatch_workers', 8))
+        self.shard_workers = int(raw_json.get('shard_workers', 1))
+        self.update_dedup_state = Path(raw_json.get(
+            'update_dedup_state',
+            str(self.clients_data / 'update_dedup.json')
+        ))
+        self.update_dedup_window = int(raw_json.get('update_dedup_window', 1024))
+        self.inbound_per_chat_rate = float(raw_json.get('inbound_per_chat_rate', 2.0))
+        self.inbound_per_chat_burst = float(raw_json.get('inbound_per_chat_burst', 5.0))
+        self.inbound_max_in_flight = int(raw_json.get('inbound_max_in_flight', 200))
+
+    def for_shard(self, shard: int) -> 'StudentTelegramFormConfig':
+        self.outbound_db = shard_path(self.outbound_db, shard)
+        self.sheet_outbox = shard_path(self.sheet_outbox, shard)
+        self.results_db = shard_path(self.results_db, shard)
+        self.update_dedup_state = shard_path(self.update_dedup_state, shard)
+        if self.results_jsonl_folder is not None:
+            self.results_jsonl_folder = self.results_jsonl_folder / f'shard-{shard}'
+        if self.results_csv_folder is not None:
+            self.results_csv_folder = self.results_csv_folder / f'shard-{shard}'
+        return self
@@ -1,23 +1,22 @@
 import argparse
+import signal
 import sys
 
 from pathlib import Path
 
 from ua_help.bot_students.config import StudentTelegramFormConfig
-from ua_help.bot_students.student_bot_command_handler import StudentBotCommandHandler
-from ua_help.spreadsheet.spreadsheet_driver import SpreadSheetDriver
-from ua_help.telegram.telegram_bot import TelegramBot
+from ua_help.bot_students.student_bot import make_student_bot
+from ua_help.telegram.sharding import ShardedFront
+from ua_help.telegram.telegram_bot import run_sharded
 
 import logging
 
 arg_parser = argparse.ArgumentParser()
 arg_parser.add_argument('--config', type=Path, help='Path to the config file', required=True)
 arg_parser.add_argument('--root', type=Path, help='Path to the root folder (with resources)', required=True)
-args = arg_parser.parse_args()
-initial_config = StudentTelegramFormConfig(args.root, args.config)
 
 
-def make_out_kwarg():
+def make_out_kwarg(args: argparse.Namespace, initial_config: StudentTelegramFormConfig):
     config_value = str(args.config)
     return {
         'level': logging.DEBUG
@@ -28,36 +27,36 @@ def make_out_kwarg():
     }
 
 
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    **make_out_kwarg())
-
-
 def main():
+    args = arg_parser.parse_args()
+    initial_config = StudentTelegramFormConfig(args.root, args.config)
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        **make_out_kwarg(args, initial_config))
+
     logging.info(f'root   = {args.root}')
     logging.info(f'config = {args.config}')
 
     root = args.root
     config = args.config
 
-    initial_config = StudentTelegramFormConfig(root, config)
-
-    sheets_driver = SpreadSheetDriver(initial_config.gdrive_cred, initial_config.spreadsheet_name)
-    bot = TelegramBot(
-        lambda chat: StudentBotCommandHandler(
-            StudentTelegramFormConfig(root, config),
-            lambda row: sheets_driver.append_row(row),
-            chat
-        ),
-        all_commands=[
-            'help',
-            'start',
-            'language',
-            'update'
-        ],
-        config=initial_config
-    )
+    if initial_config.shard_workers > 1:
+        front = ShardedFront(
+            make_student_bot,
+            (root, config),
+            initial_config.shard_workers,
+            log_kwargs=make_out_kwarg(args, initial_config)
+        )
+
+        def resize_on_reload(signum, frame):
+            front.resize(StudentTelegramFormConfig(root, config).shard_workers)
+
+        signal.signal(signal.SIGHUP, resize_on_reload)
+        run_sharded(front, initial_config)
+        return
 
+    bot, close = make_student_bot(root, config)
     bot.run()
+    close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,150 @@
+import datetime
+import logging
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from ua_help.bot_students.config import StudentTelegramFormConfig
+from ua_help.bot_students.student_bot_command_handler import StudentBotCommandHandler, SUBMISSION_ID_KEY
+from ua_help.bot_students.student_form import student_form
+from ua_help.form.field.common_fields import field_select_language
+from ua_help.form.field.picker_field import is_navigation_callback
+from ua_help.form.render_cache import RENDER_CACHE
+from ua_help.localize.language import Language
+from ua_help.localize.localize import localizer_to
+from ua_help.sink.csv_sink import CsvSink
+from ua_help.sink.fan_out_sink import FanOutSink
+from ua_help.sink.jsonl_sink import JsonlSink
+from ua_help.sink.result_sink import ResultSink
+from ua_help.sink.sheet_sink import SheetSink
+from ua_help.sink.sqlite_sink import SqliteSink
+from ua_help.spreadsheet.outbox import Outbox
+from ua_help.spreadsheet.rate_limiter import WritePolicy, QuotaRateLimiter, CircuitBreaker
+from ua_help.spreadsheet.reconciliation import Reconciler, reconcile_in_background
+from ua_help.spreadsheet.spreadsheet_driver import SpreadSheetDriver
+from ua_help.spreadsheet.status_sync import StatusIndex, StatusPoller
+from ua_help.spreadsheet.write_behind_queue import WriteBehindQueue
+from ua_help.telegram.telegram_bot import TelegramBot
+
+
+def make_result_sink(
+        config: StudentTelegramFormConfig,
+        results_db: SqliteSink,
+        sheets_queue: WriteBehindQueue
+) -> ResultSink:
+    sinks: List[ResultSink] = [results_db]
+    if config.results_jsonl_folder is not None:
+        sinks.append(JsonlSink(config.results_jsonl_folder, config.results_rotate_bytes))
+    if config.results_csv_folder is not None:
+        sinks.append(CsvSink(config.results_csv_folder, config.results_rotate_bytes))
+    sinks.append(SheetSink(sheets_queue))
+    return FanOutSink(sinks)
+
+
+def warm_render_cache(config: StudentTelegramFormConfig) -> None:
+    field_select_language().prompt()
+    for language in Language:
+        student_form(config, localizer_to(language)).warm_render_cache()
+    logging.info(f'Render cache warmed with {RENDER_CACHE.size()} prompts')
+
+
+def make_student_bot(
+        root: Path,
+        config: Path,
+        shard: Optional[int] = None
+) -> Tuple[TelegramBot, Callable[[], None]]:
+    initial_config = StudentTelegramFormConfig(root, config)
+    if shard is not None:
+        initial_config.for_shard(shard)
+
+    sheets_driver = SpreadSheetDriver(
+        initial_config.gdrive_cred,
+        initial_config.spreadsheet_name,
+        max_rows_per_worksheet=initial_config.sheet_max_rows,
+        max_cells_per_spreadsheet=initial_config.sheet_max_cells,
+        shard_key=initial_config.sheet_shard_key,
+        rollover_lock=None if shard is None else initial_config.sheet_rollover_lock
+    )
+    sheets_reconciler = Reconciler(sheets_driver, SUBMISSION_ID_KEY)
+    sheets_outbox = Outbox(initial_config.sheet_outbox)
+    sheets_queue = WriteBehindQueue(
+        sheets_driver.append_rows,
+        max_batch_size=initial_config.sheet_batch_size,
+        flush_interval=initial_config.sheet_flush_interval,
+        outbox=sheets_outbox,
+        policy=WritePolicy(
+            QuotaRateLimiter(
+                writes_per_minute=initial_config.sheet_writes_per_minute,
+                min_batch_size=initial_config.sheet_batch_size
+            ),
+            CircuitBreaker(
+                failure_threshold=initial_config.sheet_breaker_threshold,
+                recovery_timeout=initial_config.sheet_breaker_timeout
+            ),
+            SpreadSheetDriver.is_throttling_error
+        ),
+        find_landed=sheets_reconciler.landed
+    ).start()
+    results_db = SqliteSink(initial_config.results_db)
+    results = make_result_sink(initial_config, results_db, sheets_queue)
+    if initial_config.sheet_reconcile_on_start:
+        started_at = datetime.datetime.now().isoformat()
+        reconcile_in_background(
+            sheets_reconciler,
+            lambda: map(
+                lambda stored: stored[2],
+                filter(lambda stored: stored[1] < started_at, results_db.iter_rows())
+            ),
+            sheets_outbox,
+            sheets_queue
+        )
+    warm_render_cache(initial_config)
+
+    def adopt_shard(retired: int) -> None:
+        retired_config = StudentTelegramFormConfig(root, config).for_shard(retired)
+        bot.adopt_outbound(retired_config.outbound_db)
+        retired_outbox = Outbox(retired_config.sheet_outbox)
+        try:
+            sheets_queue.adopt(retired_outbox)
+        finally:
+            retired_outbox.close()
+
+    bot = TelegramBot(
+        lambda chat: StudentBotCommandHandler(
+            StudentTelegramFormConfig(root, config),
+            results.consume,
+            chat
+        ),
+        all_commands=[
+            'help',
+            'start',
+            'language',
+            'update'
+        ],
+        config=initial_config,
+        readiness_checks={'spreadsheet': sheets_driver.is_ready},
+        collapsible_callback=is_navigation_callback,
+        shard_adopter=adopt_shard
+    )
+
+    status_poller = None
+    if initial_config.sheet_status_column is not None and not shard:
+        status_poller = StatusPoller(
+            sheets_driver,
+            StatusIndex(initial_config.sheet_status_index),
+            SUBMISSION_ID_KEY,
+            initial_config.sheet_status_column,
+            lambda submission_id, status: bot.notify_status(
+                int(submission_id.rsplit('-', 1)[0]),
+                submission_id,
+                status
+            ),
+            interval=initial_config.sheet_status_poll_interval
+        ).start()
+
+    def close():
+        if status_poller is not None:
+            status_poller.stop()
+        results.close()
+        sheets_driver.stop()
+
+    return bot, close
@@ -4,7 +4,7 @@ import json
 from pathlib import Path
 from typing import List, Optional, Tuple, Callable, Dict
 
-from telegram import Chat
+from telegram import Bot, Chat
 
 from ua_help.bot_students.config import StudentTelegramFormConfig
 from ua_help.bot_students.student_form import student_form
@@ -12,12 +12,14 @@ from ua_help.common.command_handler import CommandHandler
 from ua_help.exception.categorized_exception import ToInformUserException
 from ua_help.form.field.common_fields import field_select_language
 from ua_help.form.field.form_field import FormField, TelegramContext
+from ua_help.form.field.picker_field import PickerField
 from ua_help.form.form import TextForm
 from ua_help.localize.language import Language
 from ua_help.localize.localize import localizer_to, Localized, InfoMessage
 from ua_help.telegram.util import send_error, send_plain_text
 
 MAX_FORMS_PER_CLIENT = 5
+SUBMISSION_ID_KEY = 'submission_id'
 
 
 class JsonState(enum.Enum):
@@ -27,6 +29,7 @@ class JsonState(enum.Enum):
     CHOSEN_LANGUAGE = 'chosen_language'
     TG_USERNAME = 'tg_username'
     TG_ID = 'tg_id'
+    STARTED_FORMS = 'started_forms'
 
 
 class StudentBotState(enum.Enum):
@@ -54,6 +57,7 @@ class StudentBotCommandHandler(CommandHandler):
         self.sent_forms: List[Dict[str, str]] = []
         self.forms_limit = MAX_FORMS_PER_CLIENT
         self.last_activity_datetime: Optional[datetime.datetime] = None
+        self.started_forms = 0
         self.reboot_state_from_disk()
 
     def chat_file_path(self) -> Path:
@@ -76,7 +80,8 @@ class StudentBotCommandHandler(CommandHandler):
             JsonState.LAST_ACTIVITY.value: str(self.last_activity_datetime.isoformat()),
             JsonState.CHOSEN_LANGUAGE.value: None if self.chosen_language is None else str(self.chosen_language.name),
             JsonState.TG_USERNAME.value: tg_username,
-            JsonState.TG_ID.value: tg_id
+            JsonState.TG_ID.value: tg_id,
+            JsonState.STARTED_FORMS.value: self.started_forms
         }
         with self.chat_file_path().open('w') as chat_file:
             chat_file.write(json.dumps(state))
@@ -97,6 +102,7 @@ class StudentBotCommandHandler(CommandHandler):
             self.forms_limit = int(state[JsonState.FORMS_LIMIT.value])
             self.last_activity_datetime = datetime.datetime.fromisoformat(state[JsonState.LAST_ACTIVITY.value])
             self.chosen_language = Language.from_str(lang_in_state) if lang_in_state is not None else None
+            self.started_forms = int(state.get(JsonState.STARTED_FORMS.value, len(self.sent_forms)))
 
     def get_all_commands(self) -> List[str]:
         return ['start', 'language', 'help']
@@ -120,7 +126,8 @@ class StudentBotCommandHandler(CommandHandler):
             send_error(self.translate(InfoMessage.FORMS_LIMIT_EXCEEDED.value), tg)
             return
         self.state = StudentBotState.FORM_FILL
-        self.student_form = student_form(self.config, localizer_to(self.chosen_language))
+        self.started_forms += 1
+        self.student_form = student_form(self.config, localizer_to(self.chosen_language), self.started_forms)
         self.student_form.send_info_message(tg)
 
     def __handle_start_choosing_language(self, tg: TelegramContext):
@@ -138,6 +145,9 @@ class StudentBotCommandHandler(CommandHandler):
     def __forms_left(self):
         return self.forms_limit - len(self.sent_forms)
 
+    def __next_submission_id(self) -> str:
+        return f'{self.chat.id}-{len(self.sent_forms) + 1}'
+
     def __may_start_form(self):
         return self.__forms_left() > 0
 
@@ -205,7 +215,8 @@ class StudentBotCommandHandler(CommandHandler):
             elif self.state == StudentBotState.FORM_FILL:
                 result = self.student_form.put_user_input(inp, tg)
                 if result is not None:
-                    self.sent_forms.append(self.result_consumer(result))
+                    submission = result + [(SUBMISSION_ID_KEY, self.__next_submission_id())]
+                    self.sent_forms.append(self.result_consumer(submission))
                     self.__suggest_fill_more_forms(tg)
                     self.__set_idle()
         except ToInformUserException as e:
@@ -213,5 +224,20 @@ class StudentBotCommandHandler(CommandHandler):
         finally:
             self.flush_state_to_disk(tg)
 
+    def handle_status_update(self, submission_id: str, status: str, bot: Bot) -> None:
+        ordinal = submission_id.rsplit('-', 1)[-1]
+        bot.send_message(
+            text=f'{self.translate(InfoMessage.SUBMISSION_STATUS_UPDATED.value)} (#{ordinal}): {status}',
+            chat_id=self.chat.id
+        )
+
+    def handle_inline_query(self, query: str) -> List[Tuple[str, str]]:
+        if self.state != StudentBotState.FORM_FILL or self.student_form is None:
+            return []
+        field = self.student_form.current_field()
+        if not isinstance(field, PickerField):
+            return []
+        return field.search(query)
+
     def handle_get_info(self, tg: TelegramContext) -> None:
         send_plain_text(self.translate(self.info), tg)
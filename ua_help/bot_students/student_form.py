@@ -3,14 +3,20 @@ from typing import Callable
 
 from ua_help.bot_students.config import StudentTelegramFormConfig
 from ua_help.form.field.info_field import InfoField
+from ua_help.form.choice_index import load_choice_index
 from ua_help.form.field.multiple_variants_field import MultipleVariantsField
+from ua_help.form.field.picker_field import PickerField
 from ua_help.form.field.radio_button_field import RadioButtonField
 from ua_help.form.field.text_field import TextField
 from ua_help.form.form import TextForm
 from ua_help.localize.localize import Localized, InfoMessage
 
 
-def student_form(config: StudentTelegramFormConfig, localize: Callable[[Localized], str]) -> TextForm:
+def student_form(
+        config: StudentTelegramFormConfig,
+        localize: Callable[[Localized], str],
+        version: int = 0
+) -> TextForm:
     form = TextForm(
         Localized(
             'Collecting applications for educational assistance',
@@ -18,7 +24,8 @@ def student_form(config: StudentTelegramFormConfig, localize: Callable[[Localize
             'Сбор заявок на образовательную помощь'
         ),
         InfoMessage.FINISH_STUDENT_INPUT.value,
-        localize
+        localize,
+        version
     )
 
     form.add_field(InfoField(
@@ -127,7 +134,7 @@ If there is an additional language, select the "Other" option and you will have
         information=Localized.from_folder(config.priority_choice)
     ))
 
-    form.add_field(RadioButtonField(
+    form.add_field(PickerField(
         key='subject_1_priority',
         label=Localized(
             'Subject of the 1st priority',
@@ -135,24 +142,22 @@ If there is an additional language, select the "Other" option and you will have
             'Выберите самый приоритетный для вас предмет.'
         ),
 
-        choices=Localized.choices_from_json(config.subjects_file),
+        index=load_choice_index(config.subjects_file),
         is_required=True,
-        allow_choose_other=False,
     ))
 
-    form.add_field(RadioButtonField(
+    form.add_field(PickerField(
         key='subject_2_priority',
         label=Localized(
             'Subject of the 2nd priority',
             'Виберіть другий за важливістю для вас предмет (або не вибирайте нічого)',
             'Выберите второй по важности для вас предмет (или не выбирайте ничего)'
         ),
-        choices=Localized.choices_from_json(config.subjects_file),
+        index=load_choice_index(config.subjects_file),
         is_required=False,
-        allow_choose_other=False,
     ))
 
-    form.add_field(RadioButtonField(
+    form.add_field(PickerField(
         key='subject_3_priority',
         label=Localized(
             'Subject of the 3rd priority',
@@ -160,9 +165,8 @@ If there is an additional language, select the "Other" option and you will have
             'Выберите третий по важности для вас предмет (или не выбирайте ничего)'
         ),
 
-        choices=Localized.choices_from_json(config.subjects_file),
+        index=load_choice_index(config.subjects_file),
         is_required=False,
-        allow_choose_other=False,
     ))
 
     form.add_field(InfoField(
@@ -1,5 +1,7 @@
 import abc
-from typing import Callable, List
+from typing import Callable, List, Tuple
+
+from telegram import Bot
 
 from ua_help.telegram.util import TelegramContext
 
@@ -22,3 +24,9 @@ class CommandHandler(abc.ABC):
     @abc.abstractmethod
     def get_all_commands(self) -> List[str]:
         pass
+
+    def handle_status_update(self, submission_id: str, status: str, bot: Bot) -> None:
+        pass
+
+    def handle_inline_query(self, query: str) -> List[Tuple[str, str]]:
+        return []
@@ -0,0 +1,42 @@
+import threading
+from typing import Callable, Optional
+
+from ua_help.common.log import LOGGER
+
+
+class Debouncer:
+    def __init__(self, interval: float, action: Callable[[], None], lock: Optional[threading.RLock] = None):
+        self.interval = interval
+        self.action = action
+        self.pending = False
+        self.timer: Optional[threading.Timer] = None
+        self.lock = lock if lock is not None else threading.RLock()
+
+    def trigger(self) -> None:
+        with self.lock:
+            self.pending = True
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.interval, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self) -> None:
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.pending:
+                return
+            self.pending = False
+            try:
+                self.action()
+            except Exception as e:
+                LOGGER.error(f'Debounced action failed: {e}')
+
+    def cancel(self) -> None:
+        with self.lock:
+            self.pending = False
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
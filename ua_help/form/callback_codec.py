@@ -0,0 +1,60 @@
+import dataclasses
+import re
+from typing import Optional
+
+CALLBACK_PREFIX = '~'
+SKIP_OPTION = 's'
+SUBMIT_OPTION = 'f'
+VERSIONS_COUNT = 16
+SCOPE_PLACEHOLDER = '*'
+
+
+@dataclasses.dataclass(frozen=True)
+class CallbackData:
+    field_id: int
+    option: str
+    version: int
+
+    def option_index(self) -> Optional[int]:
+        if self.option in (SKIP_OPTION, SUBMIT_OPTION):
+            return None
+        return int(self.option[1:], 16) if self.option.startswith('o') else None
+
+SCOPED_CALLBACK = re.compile(rf'("callback_data": "{re.escape(CALLBACK_PREFIX)})[0-9a-f]+\.([^."]*)\.[0-9a-f]+"')
+UNSCOPED_CALLBACK = re.compile(
+    rf'("callback_data": "{re.escape(CALLBACK_PREFIX)}){re.escape(SCOPE_PLACEHOLDER)}\.([^."]*)\.{re.escape(SCOPE_PLACEHOLDER)}"'
+)
+
+
+def option_token(index: int) -> str:
+    return f'o{index:x}'
+
+
+def encode_callback(field_id: int, option: str, version: int) -> str:
+    return f'{CALLBACK_PREFIX}{field_id:x}.{option}.{version % VERSIONS_COUNT:x}'
+
+
+def unscope_callbacks(markup_json: str) -> str:
+    return SCOPED_CALLBACK.sub(
+        lambda match: f'{match.group(1)}{SCOPE_PLACEHOLDER}.{match.group(2)}.{SCOPE_PLACEHOLDER}"',
+        markup_json
+    )
+
+
+def scope_callbacks(markup_json: str, field_id: int, version: int) -> str:
+    return UNSCOPED_CALLBACK.sub(
+        lambda match: f'{match.group(1)}{field_id:x}.{match.group(2)}.{version % VERSIONS_COUNT:x}"',
+        markup_json
+    )
+
+
+def decode_callback(data: str) -> Optional[CallbackData]:
+    if not data.startswith(CALLBACK_PREFIX):
+        return None
+    parts = data[len(CALLBACK_PREFIX):].split('.')
+    if len(parts) != 3:
+        return None
+    try:
+        return CallbackData(int(parts[0], 16), parts[1], int(parts[2], 16))
+    except ValueError:
+        return None
@@ -0,0 +1,78 @@
+import functools
+import math
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from ua_help.localize.language import Language
+from ua_help.localize.localize import Localized
+
+Choice = Tuple[Localized, str]
+
+MAX_PREFIX_LENGTH = 8
+FUZZY_MATCH_SHARE = 0.6
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def normalize(text: str) -> str:
+    return ' '.join(WORD_PATTERN.findall(text.lower().replace('ё', 'е')))
+
+
+def trigrams(text: str) -> Set[str]:
+    padded_words = map(lambda word: f'  {word} ', text.split(' '))
+    return set(word[i:i + 3] for word in padded_words for i in range(len(word) - 2))
+
+
+class ChoiceIndex:
+    def __init__(self, choices: List[Choice]):
+        self.choices = choices
+        self.by_value: Dict[str, int] = {}
+        self.by_name: Dict[str, int] = {}
+        self.names: List[List[str]] = []
+        self.prefixes: Dict[str, Set[int]] = {}
+        self.trigrams: Dict[str, Set[int]] = {}
+        for index, (localized, value) in enumerate(choices):
+            self.by_value[value] = index
+            names = list(filter(None, map(lambda language: normalize(localized.translate_to(language)), Language)))
+            self.names.append(names)
+            for name in names:
+                self.by_name.setdefault(name, index)
+                for word in [name] + name.split(' '):
+                    for length in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1):
+                        self.prefixes.setdefault(word[:length], set()).add(index)
+                for trigram in trigrams(name):
+                    self.trigrams.setdefault(trigram, set()).add(index)
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+    def find_exact(self, text: str) -> Optional[int]:
+        return self.by_name.get(normalize(text))
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[int]:
+        normalized = normalize(query)
+        if not normalized:
+            return list(range(len(self.choices)))[:limit]
+        prefix_matches = self.prefixes.get(normalized[:MAX_PREFIX_LENGTH], set())
+        if len(normalized) > MAX_PREFIX_LENGTH:
+            prefix_matches = set(filter(
+                lambda index: any(map(lambda name: normalized in name, self.names[index])),
+                prefix_matches
+            ))
+        scores: Dict[int, int] = {}
+        query_trigrams = trigrams(normalized)
+        for trigram in query_trigrams:
+            for index in self.trigrams.get(trigram, ()):
+                scores[index] = scores.get(index, 0) + 1
+        threshold = max(1, math.ceil(len(query_trigrams) * FUZZY_MATCH_SHARE))
+        fuzzy_matches = set(index for index, score in scores.items() if score >= threshold)
+        ranked = sorted(
+            prefix_matches | fuzzy_matches,
+            key=lambda index: (index not in prefix_matches, -scores.get(index, 0), index)
+        )
+        return ranked[:limit]
+
+
+@functools.lru_cache(maxsize=None)
+def load_choice_index(path: Path) -> ChoiceIndex:
+    return ChoiceIndex(Localized.choices_from_json(path))
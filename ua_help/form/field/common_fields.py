@@ -6,11 +6,12 @@ from ua_help.localize.localize import Localized
 from ua_help.localize.language import Language
 
 
-def field_select_language() -> FormField:
-    def localize_to_non_empty(info: Localized) -> str:
-        translated_to_all = map(lambda lang: info.translate_to(lang), list(Language))
-        return '/'.join(filter(lambda tr: tr != '', translated_to_all))
+def localize_to_non_empty(info: Localized) -> str:
+    translated_to_all = map(lambda lang: info.translate_to(lang), list(Language))
+    return '/'.join(filter(lambda tr: tr != '', translated_to_all))
+
 
+def field_select_language() -> FormField:
     return RadioButtonField(
         key='language',
         label=Localized("Interface language", "Виберіть мову інтерфейсу", "Выберите язык интерфейса"),
@@ -1,13 +1,19 @@
 import abc
 import logging
-from typing import TypeVar, Generic, Optional, Callable, Tuple, List
+from typing import TypeVar, Generic, Optional, Callable, Tuple, List, Dict, Hashable
 
 import telegram
-from telegram import Update, Message
+from telegram import Update, Message, ReplyMarkup
+from telegram.error import BadRequest
 from telegram.ext import CallbackContext
 
-from ua_help.exception.categorized_exception import ToInformUserExceptionWithInfo, ToInformUserException
+from ua_help.exception.categorized_exception import ToInformUserExceptionWithInfo, ToInformUserException, \
+    ToFailException
 from ua_help.exception.field_invalid_fill_exception import FieldInvalidFillException
+from ua_help.form.callback_codec import CallbackData, encode_callback, SKIP_OPTION, SUBMIT_OPTION, \
+    VERSIONS_COUNT
+from ua_help.form.message_batcher import MessageBatcher
+from ua_help.form.render_cache import RENDER_CACHE, RenderedPrompt, Fingerprint, scope_prompt
 from ua_help.localize.localize import Localized, InfoMessage
 from ua_help.telegram.util import send_error
 
@@ -33,6 +39,11 @@ class FormField(Generic[T], abc.ABC):
         self.localize = localize
         self.output: Optional[str] = None
         self.message: Optional[Message] = None
+        self.message_prefix = ''
+        self.rendered: Dict[int, Fingerprint] = {}
+        self.batcher: Optional[MessageBatcher] = None
+        self.field_id = 0
+        self.version = 0
 
     def loc_info(self, info: InfoMessage) -> str:
         if self.localize is None:
@@ -42,11 +53,81 @@ class FormField(Generic[T], abc.ABC):
     def set_localize(self, localize: Callable[[Localized], str]):
         self.localize = localize
 
+    def set_batcher(self, batcher: Optional[MessageBatcher]):
+        self.batcher = batcher
+
+    def set_callback_scope(self, field_id: int, version: int):
+        self.field_id = field_id
+        self.version = version % VERSIONS_COUNT
+
+    def callback_data(self, option: str) -> str:
+        return encode_callback(self.field_id, option, self.version)
+
+    def owns_callback(self, callback: CallbackData) -> bool:
+        return callback.field_id == self.field_id and callback.version == self.version
+
+    def prompt_state(self) -> Hashable:
+        return ()
+
+    def render_prompt(self) -> Tuple[str, Optional[ReplyMarkup]]:
+        raise ToFailException(type(self).__name__, 'has no prompt to render')
+
+    def prompt(self) -> RenderedPrompt:
+        return scope_prompt(
+            RENDER_CACHE.get_or_render(
+                (type(self).__name__, self.key, self.localize, self.prompt_state()),
+                self.render_prompt
+            ),
+            self.field_id,
+            self.version
+        )
+
+    def send_message(self, tg: TelegramContext, prompt: RenderedPrompt, parse_mode: str) -> None:
+        update, context = tg
+        self.message_prefix = '' if self.batcher is None else self.batcher.take_prefix(prompt.text, parse_mode, tg)
+        self.message = context.bot.send_message(
+            text=self.message_prefix + prompt.text,
+            chat_id=update.effective_chat.id,
+            parse_mode=parse_mode,
+            reply_markup=prompt.markup_json or None
+        )
+        self.rendered[self.message.message_id] = prompt.fingerprint
+
+    def send_or_edit_message(self, tg: TelegramContext, prompt: RenderedPrompt, parse_mode: str) -> None:
+        if self.message is None:
+            self.send_message(tg, prompt, parse_mode)
+            return
+        update, context = tg
+        message_id = self.message.message_id
+        shown_text, shown_markup = self.rendered.get(message_id, ('', ''))
+        new_text, new_markup = prompt.fingerprint
+        if (shown_text, shown_markup) == (new_text, new_markup):
+            return
+        try:
+            if shown_text == new_text:
+                context.bot.edit_message_reply_markup(
+                    chat_id=update.effective_chat.id,
+                    message_id=message_id,
+                    reply_markup=prompt.markup_json or None
+                )
+            else:
+                context.bot.edit_message_text(
+                    text=self.message_prefix + prompt.text,
+                    chat_id=update.effective_chat.id,
+                    message_id=message_id,
+                    parse_mode=parse_mode,
+                    reply_markup=prompt.markup_json or None
+                )
+        except BadRequest as e:
+            if 'message is not modified' not in e.message.lower():
+                raise
+        self.rendered[message_id] = prompt.fingerprint
+
     def make_skip_text(self):
-        return f'⏭️ {self.loc_info(InfoMessage.SKIP_TEXT_FIELD)} ⏭', 'skip'
+        return f'⏭️ {self.loc_info(InfoMessage.SKIP_TEXT_FIELD)} ⏭', self.callback_data(SKIP_OPTION)
 
     def make_submit_text(self):
-        return f'⏭️ {self.loc_info(InfoMessage.SUBMIT_MULTICHOICE)} ⏭', 'submit'
+        return f'⏭️ {self.loc_info(InfoMessage.SUBMIT_MULTICHOICE)} ⏭', self.callback_data(SUBMIT_OPTION)
 
     @staticmethod
     def make_question(text: str):
@@ -23,9 +23,14 @@ class InfoField(FormField[str]):
         update, context = tg
 
         top_info = self.make_information(self.label)
+        text = f'{top_info}\n\n{self.localize(self.information)}'
+
+        if self.batcher is not None:
+            self.batcher.add(text)
+            return
 
         context.bot.send_message(
-            text=f'{top_info}\n\n{self.localize(self.information)}',
+            text=text,
             chat_id=update.effective_chat.id,
             parse_mode=telegram.ParseMode.MARKDOWN
         )
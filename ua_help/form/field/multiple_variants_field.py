@@ -1,10 +1,13 @@
 import dataclasses
-from typing import Callable, List, Optional, Iterable, TypeVar, Tuple
+import threading
+from typing import Callable, List, Optional, Iterable, TypeVar, Tuple, Hashable
 
 import telegram
-from telegram import ReplyKeyboardMarkup, Message
+from telegram import ReplyKeyboardMarkup, Message, ReplyMarkup
 
+from ua_help.common.debouncer import Debouncer
 from ua_help.exception.categorized_exception import ToInformUserWithLocalizedMessage
+from ua_help.form.callback_codec import decode_callback, option_token, SUBMIT_OPTION
 from ua_help.form.field.form_field import FormField, TelegramContext
 from ua_help.localize.localize import Localized, InfoMessage
 from ua_help.telegram.util import make_with_message_buttons, make_reply_buttons
@@ -36,21 +39,29 @@ class MultipleVariantsField(FormField[MultipleChoice]):
             default_choice: Optional[MultipleChoice],
             bound_min: Optional[int],
             bound_max: Optional[int],
-            localize: Optional[Callable[[Localized], str]] = None
+            localize: Optional[Callable[[Localized], str]] = None,
+            edit_debounce_interval: float = 0.7
     ):
         super().__init__(key, label, default_choice, localize)
         self.choices = list(map(lambda choice: Option(choice[0], choice[1], False), choices))
         self.bound_min = bound_min
         self.bound_max = bound_max
+        self.edit_tg: Optional[TelegramContext] = None
+        self.lock = threading.RLock()
+        self.edit_debouncer = Debouncer(
+            edit_debounce_interval,
+            lambda: self.__render_help(self.edit_tg),
+            lock=self.lock
+        )
 
     def localized_choices(self) -> List[Tuple[str, str]]:
 
-        def format_choice(choice: Option) -> Tuple[str, str]:
+        def format_choice(index: int, choice: Option) -> Tuple[str, str]:
             localized_choice = self.localize(choice.localized)
             if_chosen = OPTION_CHOSEN if choice.chosen else OPTION_NOT_CHOSEN
-            return f'{if_chosen} {localized_choice}', choice.value
+            return f'{if_chosen} {localized_choice}', self.callback_data(option_token(index))
 
-        return list(map(format_choice, self.choices)) + [self.make_submit_text()]
+        return list(map(lambda indexed: format_choice(*indexed), enumerate(self.choices))) + [self.make_submit_text()]
 
     def chosen_count(self):
         return sum(map(lambda choice: int(choice.chosen), self.choices))
@@ -83,8 +94,27 @@ class MultipleVariantsField(FormField[MultipleChoice]):
         return f'{self.loc_info(InfoMessage.MUST_CHOOSE_AT_LEAST)} {self.bound_min} {self.loc_info(InfoMessage.CHOICE_PLURAL)}'
 
     def send_help(self, tg: TelegramContext) -> None:
-        update, context = tg
-
+        with self.lock:
+            if self.message is None:
+                self.__render_help(tg)
+                return
+            self.edit_tg = tg
+            self.edit_debouncer.trigger()
+
+    def try_read_value(self, user_input: str, tg: TelegramContext) -> Optional[str]:
+        with self.lock:
+            value = super().try_read_value(user_input, tg)
+            if value is not None:
+                self.edit_debouncer.flush()
+            return value
+
+    def __render_help(self, tg: TelegramContext) -> None:
+        self.send_or_edit_message(tg, self.prompt(), telegram.ParseMode.MARKDOWN)
+
+    def prompt_state(self) -> Hashable:
+        return tuple(map(lambda choice: choice.chosen, self.choices))
+
+    def render_prompt(self) -> Tuple[str, Optional[ReplyMarkup]]:
         bounds_str = ''
 
         if self.__must_choose_some_but_not():
@@ -104,18 +134,7 @@ class MultipleVariantsField(FormField[MultipleChoice]):
 
         question = FormField.make_question(self.localize(self.label))
 
-        kwargs = {
-            'text': f'{question}\n{bounds_str}{how_to_submit}',
-            'chat_id': update.effective_chat.id,
-            'parse_mode': telegram.ParseMode.MARKDOWN,
-            'reply_markup': make_with_message_buttons(self.localized_choices()),
-        }
-
-        if self.message is not None:
-            kwargs['message_id'] = self.message.message_id
-            context.bot.edit_message_text(**kwargs)
-        else:
-            self.message = context.bot.send_message(**kwargs)
+        return f'{question}\n{bounds_str}{how_to_submit}', make_with_message_buttons(self.localized_choices())
 
     def __add_option(self, index: int) -> None:
         assert index < len(self.choices)
@@ -143,18 +162,19 @@ class MultipleVariantsField(FormField[MultipleChoice]):
         ))
 
     def parse_input(self, user_input: str) -> Optional[MultipleChoice]:
-        try:
-            user_input_index = list(map(lambda choice: choice[1], self.localized_choices())).index(user_input)
-            if user_input_index == len(self.choices):
+        callback = decode_callback(user_input)
+        if callback is not None and self.owns_callback(callback):
+            if callback.option == SUBMIT_OPTION:
                 return self.__submit_choice()
-            elif self.choices[user_input_index].chosen:
-                self.__remove_option(user_input_index)
-            else:
-                self.__add_option(user_input_index)
-            return None
-        except ValueError:
-            raise ToInformUserWithLocalizedMessage(
-                f'{self.loc_info(InfoMessage.CHOICE_NOT_IN_LIST)}: {user_input}')
+            user_input_index = callback.option_index()
+            if user_input_index is not None and user_input_index < len(self.choices):
+                if self.choices[user_input_index].chosen:
+                    self.__remove_option(user_input_index)
+                else:
+                    self.__add_option(user_input_index)
+                return None
+        raise ToInformUserWithLocalizedMessage(
+            f'{self.loc_info(InfoMessage.CHOICE_NOT_IN_LIST)}: {user_input}')
 
     def repr_value(self, value: MultipleChoice) -> str:
         return ', '.join(map(lambda choice: f'{choice[0].RU}', value))
@@ -0,0 +1,140 @@
+import math
+from typing import Callable, List, Optional, Tuple, Hashable
+
+import telegram
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyMarkup
+from telegram.utils.helpers import escape_markdown
+
+from ua_help.exception.categorized_exception import ToInformUserExceptionWithInfo
+from ua_help.form.callback_codec import decode_callback, option_token
+from ua_help.form.choice_index import ChoiceIndex, Choice
+from ua_help.form.field.form_field import FormField, TelegramContext
+from ua_help.localize.localize import Localized, InfoMessage
+from ua_help.telegram.util import make_buttons_with_arranger, arrange_buttons_with_limit
+
+PAGE_OPTION_PREFIX = 'p'
+CLEAR_SEARCH_OPTION = 'c'
+
+
+def is_navigation_callback(data: str) -> bool:
+    callback = decode_callback(data)
+    return callback is not None and callback.option.startswith(PAGE_OPTION_PREFIX)
+
+
+class PickerField(FormField[Choice]):
+    def is_informational(self) -> bool:
+        return False
+
+    def __init__(
+            self,
+            key: str,
+            label: Localized,
+            index: ChoiceIndex,
+            is_required: bool,
+            page_size: int = 8,
+            localize: Optional[Callable[[Localized], str]] = None
+    ):
+        default_value = (Localized('', '', ''), '') if not is_required else None
+        super().__init__(key, label, default_value, localize)
+        self.index = index
+        self.is_required = is_required
+        self.page_size = page_size
+        self.page = 0
+        self.query = ''
+
+    def prompt_state(self) -> Hashable:
+        return self.page, self.query
+
+    def __pages_count(self, matches: List[int]) -> int:
+        return max(1, math.ceil(len(matches) / self.page_size))
+
+    def __navigation_row(self, pages_count: int) -> List[InlineKeyboardButton]:
+        row = []
+        if self.page > 0:
+            row.append(InlineKeyboardButton(
+                '◀️',
+                callback_data=self.callback_data(f'{PAGE_OPTION_PREFIX}{self.page - 1:x}')
+            ))
+        if pages_count > 1:
+            row.append(InlineKeyboardButton(
+                f'{self.page + 1}/{pages_count}',
+                callback_data=self.callback_data(f'{PAGE_OPTION_PREFIX}{self.page:x}')
+            ))
+        if self.page < pages_count - 1:
+            row.append(InlineKeyboardButton(
+                '▶️',
+                callback_data=self.callback_data(f'{PAGE_OPTION_PREFIX}{self.page + 1:x}')
+            ))
+        if self.query:
+            row.append(InlineKeyboardButton('✖️', callback_data=self.callback_data(CLEAR_SEARCH_OPTION)))
+        return row
+
+    def render_prompt(self) -> Tuple[str, Optional[ReplyMarkup]]:
+        matches = self.index.search(self.query)
+        pages_count = self.__pages_count(matches)
+        page_matches = matches[self.page * self.page_size:(self.page + 1) * self.page_size]
+
+        question_message = f'{FormField.make_question(self.localize(self.label))} {self.make_is_required(self.is_required)}'
+        if self.query:
+            question_message += f'\n\n🔍 {self.loc_info(InfoMessage.PICKER_SEARCH_RESULTS)} ' \
+                                f'_{escape_markdown(self.query)}_'
+        if not matches:
+            question_message += f'\n\nℹ️ {self.loc_info(InfoMessage.PICKER_NOTHING_FOUND)}'
+        else:
+            question_message += f'\n\nℹ️ {self.loc_info(InfoMessage.PICKER_TYPE_TO_SEARCH)}'
+
+        rows = make_buttons_with_arranger(
+            map(lambda index: (self.localize(self.index.choices[index][0]), option_token(index)), page_matches),
+            arrange_buttons_with_limit(lambda name_option: len(name_option[0])),
+            lambda name_option: InlineKeyboardButton(name_option[0], callback_data=self.callback_data(name_option[1]))
+        )
+        navigation = self.__navigation_row(pages_count)
+        if navigation:
+            rows.append(navigation)
+        rows.append([InlineKeyboardButton(
+            f'🔍 {self.loc_info(InfoMessage.PICKER_SEARCH)}',
+            switch_inline_query_current_chat=''
+        )])
+        if not self.is_required:
+            skip_text, skip_callback = self.make_skip_text()
+            rows.append([InlineKeyboardButton(skip_text, callback_data=skip_callback)])
+        return question_message, InlineKeyboardMarkup(rows)
+
+    def send_help(self, tg: TelegramContext) -> None:
+        self.send_or_edit_message(tg, self.prompt(), telegram.ParseMode.MARKDOWN)
+
+    def search(self, query: str, limit: int = 50) -> List[Tuple[str, str]]:
+        return list(map(
+            lambda index: (self.index.choices[index][1], self.localize(self.index.choices[index][0])),
+            self.index.search(query, limit)
+        ))
+
+    def parse_input(self, s: str) -> Optional[Choice]:
+        if s in self.make_skip_text():
+            return self.default_value
+        callback = decode_callback(s)
+        if callback is not None and self.owns_callback(callback):
+            if callback.option.startswith(PAGE_OPTION_PREFIX):
+                pages_count = self.__pages_count(self.index.search(self.query))
+                self.page = min(max(int(callback.option[len(PAGE_OPTION_PREFIX):], 16), 0), pages_count - 1)
+                return None
+            if callback.option == CLEAR_SEARCH_OPTION:
+                self.query = ''
+                self.page = 0
+                return None
+            index = callback.option_index()
+            if index is None or index >= len(self.index):
+                raise ToInformUserExceptionWithInfo(InfoMessage.INVALID_INPUT_FORMAT.value)
+            return self.index.choices[index]
+        exact = self.index.find_exact(s)
+        if exact is not None:
+            return self.index.choices[exact]
+        self.query = s.strip()
+        self.page = 0
+        return None
+
+    def repr_value(self, value: Choice) -> str:
+        return str(value[0].RU)
+
+    def validate_value(self, value: Choice) -> Optional[Localized]:
+        pass
@@ -1,9 +1,10 @@
 from typing import List, Callable, Optional, TypeVar, Tuple
 
 import telegram
-from telegram import ReplyKeyboardMarkup, Message
+from telegram import ReplyKeyboardMarkup, Message, ReplyMarkup
 
 from ua_help.exception.categorized_exception import ToInformUserExceptionWithInfo
+from ua_help.form.callback_codec import decode_callback, option_token
 from ua_help.form.field.form_field import FormField, TelegramContext
 from ua_help.form.field.text_field import TextField
 from ua_help.localize.localize import Localized, InfoMessage
@@ -32,9 +33,13 @@ class RadioButtonField(FormField[Tuple[Localized, R]]):
         self.allow_choose_other = allow_choose_other
 
     def send_help(self, tg: TelegramContext) -> None:
-        update, context = tg
+        self.send_or_edit_message(tg, self.prompt(), telegram.ParseMode.MARKDOWN)
 
-        all_buttons = list(map(lambda choice: (self.localize(choice[0]), choice[1]), self.choices))
+    def render_prompt(self) -> Tuple[str, Optional[ReplyMarkup]]:
+        all_buttons = list(map(
+            lambda indexed: (self.localize(indexed[1][0]), self.callback_data(option_token(indexed[0]))),
+            enumerate(self.choices)
+        ))
 
         question_message = f'{TextField.make_question(self.localize(self.label))} {self.make_is_required(self.is_required)}'
 
@@ -44,29 +49,21 @@ class RadioButtonField(FormField[Tuple[Localized, R]]):
         if not self.is_required:
             all_buttons.append(self.make_skip_text())
 
-        kwargs = {
-            'text': question_message,
-            'chat_id': update.effective_chat.id,
-            'parse_mode': telegram.ParseMode.MARKDOWN,
-            'reply_markup': make_with_message_buttons(all_buttons)
-        }
-
-        if self.message is not None:
-            kwargs['message_id'] = self.message.message_id
-            context.bot.edit_message_text(**kwargs)
-        else:
-            self.message = context.bot.send_message(**kwargs)
+        return question_message, make_with_message_buttons(all_buttons)
 
     def parse_input(self, s: str) -> Optional[Tuple[Localized, R]]:
         try:
             if s in self.make_skip_text():
                 return self.default_value
-            matches = list(filter(lambda choice: choice[1] == s, self.choices))
-            if not matches:
-                if self.allow_choose_other:
-                    return InfoMessage.OTHER_OPTION.value, s
-                raise ValueError()
-            return matches[0]
+            callback = decode_callback(s)
+            if callback is not None and self.owns_callback(callback):
+                index = callback.option_index()
+                if index is None or index >= len(self.choices):
+                    raise ValueError()
+                return self.choices[index]
+            if self.allow_choose_other:
+                return InfoMessage.OTHER_OPTION.value, s
+            raise ValueError()
         except ValueError:
             raise ToInformUserExceptionWithInfo(InfoMessage.INVALID_INPUT_FORMAT.value)
 
@@ -1,8 +1,8 @@
 import re
-from typing import Optional, Callable
+from typing import Optional, Callable, Tuple
 
 import telegram
-from telegram import ReplyKeyboardRemove
+from telegram import ReplyKeyboardRemove, ReplyMarkup
 
 from ua_help.form.field.form_field import FormField, TelegramContext
 from ua_help.localize.localize import Localized, InfoMessage
@@ -28,20 +28,17 @@ class TextField(FormField[str]):
         self.is_required = is_required
 
     def send_help(self, tg: TelegramContext) -> None:
-        update, context = tg
+        self.send_message(tg, self.prompt(), telegram.ParseMode.MARKDOWN)
 
+    def render_prompt(self) -> Tuple[str, Optional[ReplyMarkup]]:
         question = FormField.make_question(f'{self.loc_info(InfoMessage.PLEASE_INPUT)} {self.localize(self.label)}')
 
         help_markdown = f'''{question} {self.make_is_required(self.is_required)}
 {self.loc_info(InfoMessage.INPUT_FORMAT)}: _{self.localize(self.pattern_explanation)}_
 '''
 
-        self.message = context.bot.send_message(
-            text=help_markdown,
-            chat_id=update.effective_chat.id,
-            parse_mode=telegram.ParseMode.MARKDOWN,
-            reply_markup=ReplyKeyboardRemove() if self.is_required else make_with_message_buttons(
-                [self.make_skip_text()])
+        return help_markdown, ReplyKeyboardRemove() if self.is_required else make_with_message_buttons(
+            [self.make_skip_text()]
         )
 
     def parse_input(self, s: str) -> str:
@@ -4,9 +4,12 @@ from typing import List, Callable, Optional, Dict, Tuple
 import telegram
 from telegram import ReplyKeyboardMarkup
 
+from ua_help.common.log import LOGGER
 from ua_help.exception.categorized_exception import ToFailException
 from ua_help.form.field.form_field import FormField, TelegramContext
 from ua_help.form.field.common_fields import field_select_language
+from ua_help.form.callback_codec import decode_callback
+from ua_help.form.message_batcher import MessageBatcher
 from ua_help.localize.localize import Localized, InfoMessage
 from ua_help.localize.language import Language
 from ua_help.telegram.util import make_reply_buttons
@@ -20,7 +23,8 @@ class TextForm:
             self,
             form_information: Localized,
             form_finish_information: Localized,
-            localize: Callable[[Localized], str]
+            localize: Callable[[Localized], str],
+            version: int = 0
     ):
         self.form_information = form_information
         self.form_finish_information = form_finish_information
@@ -28,6 +32,8 @@ class TextForm:
         self.fields: List[FormField] = []
         self.filled_fields: List[Tuple[str, str]] = []
         self.active_field_index = 0
+        self.batcher = MessageBatcher()
+        self.version = version
 
     def set_localize(self, localize: Callable[[Localized], str]):
         self.localize = localize
@@ -37,6 +43,13 @@ class TextForm:
     def add_field(self, field: FormField):
         self.fields.append(field)
         field.set_localize(self.localize)
+        field.set_batcher(self.batcher)
+        field.set_callback_scope(len(self.fields) - 1, self.version)
+
+    def warm_render_cache(self) -> None:
+        for field in self.fields:
+            if not field.is_informational():
+                field.prompt()
 
     def all_filled(self) -> bool:
         return self.active_field_index == len(self.fields)
@@ -48,6 +61,7 @@ class TextForm:
         update, context = tg
         next_field = self.active_field(tg)
         if next_field is None:
+            self.batcher.flush(tg)
             context.bot.send_message(
                 text=self.localize(self.form_finish_information),
                 chat_id=update.effective_chat.id,
@@ -56,19 +70,17 @@ class TextForm:
             return self.filled_fields
         else:
             next_field.send_help(tg)
+            self.batcher.flush(tg)
 
     def send_info_message(self, tg: TelegramContext):
-        update, context = tg
         localized_info = self.localize(self.form_information)
 
-        context.bot.send_message(
-            text=f'*{localized_info}*',
-            chat_id=update.effective_chat.id,
-            parse_mode=telegram.ParseMode.MARKDOWN
-        )
-
+        self.batcher.add(f'*{localized_info}*')
         self.send_help_for_current(tg)
 
+    def current_field(self) -> Optional[FormField]:
+        return self.fields[self.active_field_index] if not self.all_filled() else None
+
     def active_field(self, tg: TelegramContext) -> Optional[FormField]:
         while not self.all_filled() and self.fields[self.active_field_index].is_informational():
             self.fields[self.active_field_index].send_help(tg)
@@ -89,6 +101,11 @@ class TextForm:
 
         assert field_to_put_info is not None
 
+        callback = decode_callback(user_input)
+        if callback is not None and not field_to_put_info.owns_callback(callback):
+            LOGGER.info(f'Drop stale button press {user_input} for field {field_to_put_info.key}')
+            return None
+
         value_of_field = field_to_put_info.try_read_value(user_input, tg)
         if value_of_field is not None:
             self.filled_fields.append((field_to_put_info.key, value_of_field))
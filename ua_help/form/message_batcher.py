@@ -0,0 +1,64 @@
+from typing import List
+
+import telegram
+
+from ua_help.telegram.util import TelegramContext
+
+MESSAGE_LENGTH_LIMIT = 4096
+PARTS_SEPARATOR = '\n\n'
+
+
+def telegram_length(text: str) -> int:
+    return len(text.encode('utf-16-le')) // 2
+
+
+class MessageBatcher:
+    def __init__(self, parse_mode: str = telegram.ParseMode.MARKDOWN, limit: int = MESSAGE_LENGTH_LIMIT):
+        self.parse_mode = parse_mode
+        self.limit = limit
+        self.pending: List[str] = []
+
+    def add(self, text: str) -> None:
+        self.pending.append(text)
+
+    def has_pending(self) -> bool:
+        return bool(self.pending)
+
+    def __fits(self, parts: List[str]) -> bool:
+        return telegram_length(PARTS_SEPARATOR.join(parts)) <= self.limit
+
+    def __send(self, parts: List[str], tg: TelegramContext) -> None:
+        update, context = tg
+        context.bot.send_message(
+            text=PARTS_SEPARATOR.join(parts),
+            chat_id=update.effective_chat.id,
+            parse_mode=self.parse_mode
+        )
+
+    def __send_greedily(self, parts: List[str], tg: TelegramContext) -> None:
+        message: List[str] = []
+        for part in parts:
+            if message and not self.__fits(message + [part]):
+                self.__send(message, tg)
+                message = []
+            message.append(part)
+        if message:
+            self.__send(message, tg)
+
+    def take_prefix(self, text: str, parse_mode: str, tg: TelegramContext) -> str:
+        if not self.pending:
+            return ''
+        if parse_mode != self.parse_mode:
+            self.flush(tg)
+            return ''
+        first_kept = next(filter(
+            lambda i: self.__fits(self.pending[i:] + [text]),
+            range(len(self.pending))
+        ), len(self.pending))
+        pending, self.pending = self.pending, []
+        self.__send_greedily(pending[:first_kept], tg)
+        return ''.join(map(lambda part: part + PARTS_SEPARATOR, pending[first_kept:]))
+
+    def flush(self, tg: TelegramContext) -> None:
+        pending, self.pending = self.pending, []
+        self.__send_greedily(pending, tg)
@@ -0,0 +1,75 @@
+import dataclasses
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+from telegram import ReplyMarkup
+
+from ua_help.form.callback_codec import scope_callbacks, unscope_callbacks
+
+Fingerprint = Tuple[str, str]
+
+
+@dataclasses.dataclass(frozen=True)
+class RenderedPrompt:
+    text: str
+    markup_json: str
+    fingerprint: Fingerprint
+
+
+def fingerprint(text: str, markup_json: str) -> Fingerprint:
+    return (
+        hashlib.sha1(text.encode('utf-8')).hexdigest(),
+        hashlib.sha1(markup_json.encode('utf-8')).hexdigest()
+    )
+
+
+def make_rendered_prompt(text: str, reply_markup: Optional[ReplyMarkup]) -> RenderedPrompt:
+    markup_json = '' if reply_markup is None else unscope_callbacks(reply_markup.to_json())
+    return RenderedPrompt(text, markup_json, fingerprint(text, markup_json))
+
+
+def scope_prompt(prompt: RenderedPrompt, field_id: int, version: int) -> RenderedPrompt:
+    if not prompt.markup_json:
+        return prompt
+    text_fingerprint, markup_fingerprint = prompt.fingerprint
+    return RenderedPrompt(
+        prompt.text,
+        scope_callbacks(prompt.markup_json, field_id, version),
+        (text_fingerprint, f'{markup_fingerprint}.{field_id:x}.{version:x}')
+    )
+
+
+class RenderCache:
+    def __init__(self, max_entries: int = 8192):
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(
+            self,
+            key: Hashable,
+            render: Callable[[], Tuple[str, Optional[ReplyMarkup]]]
+    ) -> RenderedPrompt:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        prompt = make_rendered_prompt(*render())
+        with self.lock:
+            self.entries[key] = prompt
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return prompt
+
+    def size(self) -> int:
+        with self.lock:
+            return len(self.entries)
+
+
+RENDER_CACHE = RenderCache()
@@ -1,5 +1,6 @@
 import dataclasses
 import enum
+import functools
 import json
 from pathlib import Path
 from typing import List, Callable
@@ -69,6 +70,7 @@ def localize_to_all_languages(localized: Localized) -> str:
     return '/'.join(map(lambda lang: localized.translate_to(lang), list(Language)))
 
 
+@functools.lru_cache(maxsize=None)
 def localizer_to(lang: Language) -> Callable[[Localized], str]:
     def localize(localized: Localized) -> str:
         return localized.translate_to(lang)
@@ -340,3 +342,33 @@ class InfoMessage(enum.Enum):
         "Інший варіант",
         "Другой вариант"
     )
+
+    SUBMISSION_STATUS_UPDATED = Localized(
+        "The status of your application has changed",
+        "Статус вашої заявки змінився",
+        "Статус вашей заявки изменился"
+    )
+
+    PICKER_SEARCH = Localized(
+        "Search",
+        "Пошук",
+        "Поиск"
+    )
+
+    PICKER_TYPE_TO_SEARCH = Localized(
+        "Choose an option below or type a part of its name to search",
+        "Оберіть варіант нижче або введіть частину назви для пошуку",
+        "Выберите вариант ниже или введите часть названия для поиска"
+    )
+
+    PICKER_NOTHING_FOUND = Localized(
+        "Nothing found, try another query",
+        "Нічого не знайдено, спробуйте інший запит",
+        "Ничего не найдено, попробуйте другой запрос"
+    )
+
+    PICKER_SEARCH_RESULTS = Localized(
+        "Search results for",
+        "Результати пошуку для",
+        "Результаты поиска для"
+    )
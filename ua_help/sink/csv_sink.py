@@ -0,0 +1,24 @@
+import csv
+import io
+from pathlib import Path
+from typing import List
+
+from ua_help.sink.result_sink import TableRow
+from ua_help.sink.rotating_file_sink import RotatingFileSink
+
+
+def format_csv_line(values: List[str]) -> str:
+    line = io.StringIO()
+    csv.writer(line).writerow(values)
+    return line.getvalue()
+
+
+class CsvSink(RotatingFileSink):
+    def __init__(self, folder: Path, max_bytes: int = 16 * 1024 * 1024, name: str = 'csv'):
+        super().__init__(folder, 'results', '.csv', max_bytes, name)
+
+    def format_header(self, row: TableRow) -> str:
+        return format_csv_line(list(map(lambda kv: kv[0], row)))
+
+    def format_row(self, row: TableRow) -> str:
+        return format_csv_line(list(map(lambda kv: kv[1], row)))
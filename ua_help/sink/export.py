@@ -0,0 +1,33 @@
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
+from ua_help.sink.sqlite_sink import SqliteSink
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Stream stored form results out of the results database')
+    arg_parser.add_argument('--db', type=Path, help='Path to the results database', required=True)
+    arg_parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    arg_parser.add_argument('--after-id', type=int, default=0, help='Export only results with a greater id')
+    args = arg_parser.parse_args()
+
+    sink = SqliteSink(args.db)
+    csv_writer = csv.writer(sys.stdout)
+    header_written = False
+    for row_id, created_at, row in sink.iter_rows(after_id=args.after_id):
+        if args.format == 'jsonl':
+            record = {'id': row_id, 'created_at': created_at, 'row': dict(row)}
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            if not header_written:
+                csv_writer.writerow(['id', 'created_at'] + list(map(lambda kv: kv[0], row)))
+                header_written = True
+            csv_writer.writerow([row_id, created_at] + list(map(lambda kv: kv[1], row)))
+    sink.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from ua_help.common.log import LOGGER
+from ua_help.exception.categorized_exception import ToFailException
+from ua_help.sink.result_sink import ResultSink, TableRow
+
+
+class FanOutSink(ResultSink):
+    def __init__(self, sinks: List[ResultSink], name: str = 'fan_out'):
+        super().__init__(name)
+        self.sinks = sinks
+        self.executor = ThreadPoolExecutor(max_workers=max(len(sinks), 1), thread_name_prefix='result-sink')
+
+    def consume(self, row: TableRow) -> Dict[str, str]:
+        futures = list(map(lambda sink: self.executor.submit(sink.consume, row), self.sinks))
+        return self.__merge(list(map(self.__result, futures)))
+
+    @staticmethod
+    def __result(future: Future) -> Any:
+        try:
+            return future.result()
+        except Exception as e:
+            return e
+
+    def __merge(self, results: List[Any]) -> Dict[str, str]:
+        receipt: Dict[str, str] = {}
+        failed: List[str] = []
+        for sink, result in zip(self.sinks, results):
+            if isinstance(result, Exception):
+                LOGGER.error(f'Result sink {sink.name} failed: {result}')
+                failed.append(sink.name)
+                continue
+            for key, value in result.items():
+                receipt[f'{sink.name}.{key}'] = value
+        if len(failed) == len(self.sinks):
+            raise ToFailException('FanOutSink', f'all result sinks failed: {failed}')
+        if failed:
+            receipt['failed_sinks'] = ','.join(failed)
+        return receipt
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        for sink in self.sinks:
+            sink.close()
@@ -0,0 +1,15 @@
+import datetime
+import json
+from pathlib import Path
+
+from ua_help.sink.result_sink import TableRow
+from ua_help.sink.rotating_file_sink import RotatingFileSink
+
+
+class JsonlSink(RotatingFileSink):
+    def __init__(self, folder: Path, max_bytes: int = 16 * 1024 * 1024, name: str = 'jsonl'):
+        super().__init__(folder, 'results', '.jsonl', max_bytes, name)
+
+    def format_row(self, row: TableRow) -> str:
+        record = {'created_at': datetime.datetime.now().isoformat(), 'row': dict(row)}
+        return json.dumps(record, ensure_ascii=False) + '\n'
@@ -0,0 +1,16 @@
+import abc
+from typing import Dict, List, Tuple
+
+TableRow = List[Tuple[str, str]]
+
+
+class ResultSink(abc.ABC):
+    def __init__(self, name: str):
+        self.name = name
+
+    @abc.abstractmethod
+    def consume(self, row: TableRow) -> Dict[str, str]:
+        pass
+
+    def close(self) -> None:
+        pass
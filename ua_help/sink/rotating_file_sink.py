@@ -0,0 +1,54 @@
+import abc
+import datetime
+import threading
+from pathlib import Path
+from typing import Dict, Optional, TextIO
+
+from ua_help.common.log import LOGGER
+from ua_help.sink.result_sink import ResultSink, TableRow
+
+
+class RotatingFileSink(ResultSink):
+    def __init__(self, folder: Path, prefix: str, suffix: str, max_bytes: int, name: str):
+        super().__init__(name)
+        folder.mkdir(parents=True, exist_ok=True)
+        self.folder = folder
+        self.prefix = prefix
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.file: Optional[TextIO] = None
+        self.file_path: Optional[Path] = None
+        self.file_index = 0
+
+    @abc.abstractmethod
+    def format_row(self, row: TableRow) -> str:
+        pass
+
+    def format_header(self, row: TableRow) -> str:
+        return ''
+
+    def __open_next_file(self, row: TableRow) -> None:
+        if self.file is not None:
+            self.file.close()
+        self.file_index += 1
+        timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        self.file_path = self.folder / f'{self.prefix}-{timestamp}-{self.file_index}{self.suffix}'
+        LOGGER.info(f'{self.name} sink writes to {self.file_path}')
+        self.file = self.file_path.open('a', encoding='utf-8', newline='')
+        self.file.write(self.format_header(row))
+
+    def consume(self, row: TableRow) -> Dict[str, str]:
+        line = self.format_row(row)
+        with self.lock:
+            if self.file is None or self.file.tell() + len(line.encode('utf-8')) > self.max_bytes:
+                self.__open_next_file(row)
+            self.file.write(line)
+            self.file.flush()
+            return {'file': str(self.file_path)}
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
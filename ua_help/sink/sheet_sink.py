@@ -0,0 +1,17 @@
+from typing import Dict
+
+from ua_help.sink.result_sink import ResultSink, TableRow
+from ua_help.spreadsheet.write_behind_queue import WriteBehindQueue
+
+
+class SheetSink(ResultSink):
+    def __init__(self, queue: WriteBehindQueue, drain_timeout: float = 30.0, name: str = 'sheet'):
+        super().__init__(name)
+        self.queue = queue
+        self.drain_timeout = drain_timeout
+
+    def consume(self, row: TableRow) -> Dict[str, str]:
+        return self.queue.put(row)
+
+    def close(self) -> None:
+        self.queue.stop(timeout=self.drain_timeout)
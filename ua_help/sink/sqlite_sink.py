@@ -0,0 +1,59 @@
+import datetime
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+from ua_help.common.log import LOGGER
+from ua_help.sink.result_sink import ResultSink, TableRow
+
+StoredRow = Tuple[int, str, TableRow]
+
+
+class SqliteSink(ResultSink):
+    def __init__(self, path: Path, name: str = 'sqlite'):
+        super().__init__(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        LOGGER.info(f'Open results database {path}')
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT NOT NULL,
+                row TEXT NOT NULL
+            )
+        ''')
+
+    def consume(self, row: TableRow) -> Dict[str, str]:
+        created_at = datetime.datetime.now().isoformat()
+        with self.lock:
+            cursor = self.connection.execute(
+                'INSERT INTO results (created_at, row) VALUES (?, ?)',
+                (created_at, json.dumps(row, ensure_ascii=False))
+            )
+        return {'id': str(cursor.lastrowid), 'created_at': created_at}
+
+    def iter_rows(self, after_id: int = 0, batch_size: int = 500) -> Iterator[StoredRow]:
+        reader = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+        try:
+            cursor = reader.execute(
+                'SELECT id, created_at, row FROM results WHERE id > ? ORDER BY id',
+                (after_id,)
+            )
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    return
+                for row_id, created_at, row in batch:
+                    yield row_id, created_at, list(map(tuple, json.loads(row)))
+        finally:
+            reader.close()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,163 @@
+import argparse
+import logging
+import math
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ua_help.spreadsheet.emulator import EmulatedSheetsClient, EmulatorSettings
+from ua_help.spreadsheet.rate_limiter import WritePolicy, QuotaRateLimiter, CircuitBreaker
+from ua_help.spreadsheet.spreadsheet_driver import SpreadSheetDriver, TableRow
+from ua_help.spreadsheet.write_behind_queue import WriteBehindQueue
+
+SPREADSHEET_TITLE = '[Benchmark] Requests for help'
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(math.ceil(q * len(ordered)) - 1, 0))]
+
+
+class LandingRecorder:
+    def __init__(self, driver: SpreadSheetDriver):
+        self.driver = driver
+        self.landed_at: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def append_rows(self, rows: List[TableRow]) -> Dict[str, str]:
+        response = self.driver.append_rows(rows)
+        now = time.monotonic()
+        with self.lock:
+            for row in rows:
+                self.landed_at[row[0][1]] = now
+        return response
+
+    def append_row(self, row: TableRow) -> Dict[str, str]:
+        return self.append_rows([row])
+
+
+def make_rows(count: int) -> List[TableRow]:
+    return list(map(lambda i: [('id', str(i)), ('name', f'Student {i}'), ('grade', str(i % 12 + 1))], range(count)))
+
+
+def run_producers(rows: List[TableRow], producers: int, submit) -> Dict[str, float]:
+    call_latencies: List[float] = []
+    submitted_at: Dict[str, float] = {}
+    failures = [0]
+    lock = threading.Lock()
+
+    def produce(part: List[TableRow]):
+        for row in part:
+            started = time.monotonic()
+            try:
+                submit(row)
+            except Exception:
+                with lock:
+                    failures[0] += 1
+            finished = time.monotonic()
+            with lock:
+                call_latencies.append(finished - started)
+                submitted_at[row[0][1]] = started
+
+    threads = list(map(
+        lambda i: threading.Thread(target=produce, args=(rows[i::producers],)),
+        range(producers)
+    ))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        'call_p50': percentile(call_latencies, 0.5),
+        'call_p99': percentile(call_latencies, 0.99),
+        'failed_calls': failures[0],
+        'submitted_at': submitted_at
+    }
+
+
+def benchmark(mode: str, args: argparse.Namespace) -> Dict[str, float]:
+    settings = EmulatorSettings(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        requests_per_minute=args.requests_per_minute,
+        seed=args.seed
+    )
+    client = EmulatedSheetsClient(settings, [SPREADSHEET_TITLE])
+    driver = SpreadSheetDriver(Path('emulator'), SPREADSHEET_TITLE, client_factory=lambda: client)
+    if not driver.wait_ready(args.connect_timeout):
+        logging.warning(f'Emulated spreadsheet not connected in {args.connect_timeout}s, connect on the first write')
+    recorder = LandingRecorder(driver)
+    rows = make_rows(args.rows)
+    queue: Optional[WriteBehindQueue] = None
+    started = time.monotonic()
+
+    if mode == 'direct':
+        stats = run_producers(rows, args.producers, recorder.append_row)
+    else:
+        queue = WriteBehindQueue(
+            recorder.append_rows,
+            max_batch_size=args.batch_size,
+            flush_interval=args.flush_interval,
+            policy=WritePolicy(
+                QuotaRateLimiter(
+                    writes_per_minute=args.requests_per_minute or 1_000_000,
+                    base_backoff=args.backoff,
+                    min_batch_size=args.batch_size
+                ),
+                CircuitBreaker(),
+                SpreadSheetDriver.is_throttling_error
+            )
+        ).start()
+        stats = run_producers(rows, args.producers, queue.put)
+        queue.stop(timeout=args.drain_timeout)
+    elapsed = time.monotonic() - started
+    driver.stop()
+
+    end_to_end = list(map(
+        lambda landed: landed[1] - stats['submitted_at'][landed[0]],
+        recorder.landed_at.items()
+    ))
+    return {
+        'rows_per_second': len(recorder.landed_at) / elapsed,
+        'landed_rows': len(recorder.landed_at),
+        'failed_calls': stats['failed_calls'],
+        'call_p50_ms': stats['call_p50'] * 1000,
+        'call_p99_ms': stats['call_p99'] * 1000,
+        'end_to_end_p99_ms': percentile(end_to_end, 0.99) * 1000,
+        'api_requests': client.api.requests_count,
+        'api_errors': client.api.errors_count
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Measure spreadsheet sink throughput against the Sheets emulator')
+    arg_parser.add_argument('--mode', choices=['direct', 'queue', 'both'], default='both')
+    arg_parser.add_argument('--rows', type=int, default=1000)
+    arg_parser.add_argument('--producers', type=int, default=8)
+    arg_parser.add_argument('--latency', type=float, default=0.05, help='Emulated API latency, seconds')
+    arg_parser.add_argument('--latency-jitter', type=float, default=0.02, help='Extra random latency, seconds')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help='Probability of an emulated 503')
+    arg_parser.add_argument('--requests-per-minute', type=int, default=None, help='Emulated quota')
+    arg_parser.add_argument('--batch-size', type=int, default=50)
+    arg_parser.add_argument('--flush-interval', type=float, default=0.2)
+    arg_parser.add_argument('--backoff', type=float, default=0.1, help='Base backoff of the write policy, seconds')
+    arg_parser.add_argument('--drain-timeout', type=float, default=120.0)
+    arg_parser.add_argument('--connect-timeout', type=float, default=30.0)
+    arg_parser.add_argument('--seed', type=int, default=None)
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.WARNING)
+
+    modes = ['direct', 'queue'] if args.mode == 'both' else [args.mode]
+    for mode in modes:
+        result = benchmark(mode, args)
+        formatted = ', '.join(map(lambda kv: f'{kv[0]}={kv[1]:.1f}', result.items()))
+        print(f'{mode}: {formatted}')
+
+
+if __name__ == '__main__':
+    main()
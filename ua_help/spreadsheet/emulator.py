@@ -0,0 +1,256 @@
+import dataclasses
+import datetime
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import gspread
+
+from ua_help.common.log import LOGGER
+
+
+@dataclasses.dataclass
+class EmulatorSettings:
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    error_rate: float = 0.0
+    requests_per_minute: Optional[int] = None
+    seed: Optional[int] = None
+
+
+class EmulatedResponse:
+    def __init__(self, status_code: int, message: str, body: Optional[Dict] = None):
+        self.status_code = status_code
+        self.text = message
+        self.body = body
+
+    def json(self) -> Dict:
+        if self.body is not None:
+            return self.body
+        return {
+            'error': {
+                'code': self.status_code,
+                'message': self.text,
+                'status': 'RESOURCE_EXHAUSTED' if self.status_code == 429 else 'UNAVAILABLE'
+            }
+        }
+
+
+class EmulatedCredentials:
+    def __init__(self):
+        self.expiry: Optional[datetime.datetime] = None
+
+
+class EmulatedApi:
+    def __init__(self, settings: EmulatorSettings):
+        self.settings = settings
+        self.random = random.Random(settings.seed)
+        self.request_times: Deque[float] = deque()
+        self.requests_count = 0
+        self.errors_count = 0
+        self.lock = threading.Lock()
+
+    def __check_quota(self, now: float) -> bool:
+        while self.request_times and self.request_times[0] <= now - 60.0:
+            self.request_times.popleft()
+        if self.settings.requests_per_minute is not None \
+                and len(self.request_times) >= self.settings.requests_per_minute:
+            return False
+        self.request_times.append(now)
+        return True
+
+    def request(self, method: str) -> None:
+        with self.lock:
+            self.requests_count += 1
+            delay = self.settings.latency + self.random.uniform(0, self.settings.latency_jitter)
+            within_quota = self.__check_quota(time.monotonic())
+            failed = self.random.random() < self.settings.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if not within_quota:
+            with self.lock:
+                self.errors_count += 1
+            raise gspread.exceptions.APIError(EmulatedResponse(429, f'Quota exceeded for {method}'))
+        if failed:
+            with self.lock:
+                self.errors_count += 1
+            raise gspread.exceptions.APIError(EmulatedResponse(503, f'The service is currently unavailable: {method}'))
+
+
+class EmulatedWorksheet:
+    def __init__(self, api: EmulatedApi, spreadsheet: 'EmulatedSpreadsheet', worksheet_id: int, title: str, rows: int,
+                 cols: int):
+        self.api = api
+        self.spreadsheet = spreadsheet
+        self.id = worksheet_id
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.values: List[List[str]] = []
+        self.lock = threading.Lock()
+
+    def __append(self, rows: List[List[str]]) -> Dict:
+        self.spreadsheet.touch()
+        with self.lock:
+            first_row = len(self.values) + 1
+            self.values.extend(map(list, rows))
+            self.row_count = max(self.row_count, len(self.values))
+            self.col_count = max([self.col_count] + list(map(len, rows)))
+            return {
+                'updates': {
+                    'updatedRange': f'{self.title}!A{first_row}',
+                    'updatedRows': len(rows)
+                }
+            }
+
+    def append_row(self, values: List[str], **kwargs) -> Dict:
+        self.api.request('append_row')
+        return self.__append([values])
+
+    def append_rows(self, values: List[List[str]], **kwargs) -> Dict:
+        self.api.request('append_rows')
+        return self.__append(values)
+
+    def update_cell(self, row: int, col: int, value: str) -> Dict:
+        self.api.request('update_cell')
+        self.spreadsheet.touch()
+        with self.lock:
+            while len(self.values) < row:
+                self.values.append([])
+            cells = self.values[row - 1]
+            while len(cells) < col:
+                cells.append('')
+            cells[col - 1] = value
+            self.row_count = max(self.row_count, len(self.values))
+            self.col_count = max(self.col_count, len(cells))
+        return {'updatedCells': 1}
+
+    def get_all_values(self, **kwargs) -> List[List[str]]:
+        self.api.request('get_all_values')
+        with self.lock:
+            return list(map(list, self.values))
+
+    def col_values(self, col: int, **kwargs) -> List[str]:
+        self.api.request('col_values')
+        with self.lock:
+            column = list(map(lambda row: row[col - 1] if col <= len(row) else '', self.values))
+        while column and column[-1] == '':
+            column.pop()
+        return column
+
+
+class EmulatedSpreadsheet:
+    def __init__(self, api: EmulatedApi, spreadsheet_id: str, title: str):
+        self.api = api
+        self.id = spreadsheet_id
+        self.title = title
+        self.worksheet_ids = itertools.count()
+        self.all_worksheets: List[EmulatedWorksheet] = []
+        self.permissions: List[Dict[str, str]] = []
+        self.version = 1
+        self.lock = threading.Lock()
+        self.__add_worksheet('Sheet1', 1000, 26)
+
+    def touch(self) -> None:
+        with self.lock:
+            self.version += 1
+
+    def __add_worksheet(self, title: str, rows: int, cols: int) -> EmulatedWorksheet:
+        with self.lock:
+            if any(map(lambda worksheet: worksheet.title == title, self.all_worksheets)):
+                raise gspread.exceptions.APIError(EmulatedResponse(400, f'Worksheet {title} already exists'))
+            worksheet = EmulatedWorksheet(self.api, self, next(self.worksheet_ids), title, rows, cols)
+            self.all_worksheets.append(worksheet)
+            self.version += 1
+            return worksheet
+
+    @property
+    def sheet1(self) -> EmulatedWorksheet:
+        self.api.request('sheet1')
+        return self.all_worksheets[0]
+
+    def worksheets(self) -> List[EmulatedWorksheet]:
+        self.api.request('worksheets')
+        return list(self.all_worksheets)
+
+    def worksheet(self, title: str) -> EmulatedWorksheet:
+        self.api.request('worksheet')
+        for worksheet in self.all_worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise gspread.exceptions.WorksheetNotFound(title)
+
+    def add_worksheet(self, title: str, rows: int, cols: int, **kwargs) -> EmulatedWorksheet:
+        self.api.request('add_worksheet')
+        return self.__add_worksheet(title, rows, cols)
+
+    def values_batch_get(self, ranges: List[str], **kwargs) -> Dict:
+        self.api.request('values_batch_get')
+        value_ranges = []
+        for a1_range in ranges:
+            title, cells = a1_range.rsplit('!', 1)
+            title = title[1:-1].replace("''", "'") if title.startswith("'") else title
+            worksheet = next(filter(lambda candidate: candidate.title == title, self.all_worksheets))
+            start, end = cells.split(':')
+            with worksheet.lock:
+                if start.isdigit():
+                    rows = worksheet.values[int(start) - 1:int(end)]
+                    values = list(map(list, rows))
+                else:
+                    column_letter = start.rstrip('0123456789')
+                    first_row = int(start[len(column_letter):] or 1)
+                    column = gspread.utils.a1_to_rowcol(f'{column_letter}1')[1]
+                    values = list(map(
+                        lambda row: [row[column - 1]] if column <= len(row) and row[column - 1] != '' else [],
+                        worksheet.values[first_row - 1:]
+                    ))
+            while values and not values[-1]:
+                values.pop()
+            value_ranges.append({'range': a1_range, 'majorDimension': 'ROWS', 'values': values})
+        return {'spreadsheetId': self.id, 'valueRanges': value_ranges}
+
+    def list_permissions(self) -> List[Dict[str, str]]:
+        self.api.request('list_permissions')
+        return list(self.permissions)
+
+    def share(self, value: str, perm_type: str, role: str, **kwargs) -> None:
+        self.api.request('share')
+        self.permissions.append({'emailAddress': value, 'type': perm_type, 'role': role})
+
+
+class EmulatedSheetsClient:
+    def __init__(self, settings: EmulatorSettings, titles: List[str]):
+        self.api = EmulatedApi(settings)
+        self.auth = EmulatedCredentials()
+        self.spreadsheet_ids = itertools.count()
+        self.spreadsheets: Dict[str, EmulatedSpreadsheet] = {}
+        for title in titles:
+            self.__create(title)
+        LOGGER.info(f'Sheets emulator started with spreadsheets {titles} and {settings}')
+
+    def __create(self, title: str) -> EmulatedSpreadsheet:
+        spreadsheet = EmulatedSpreadsheet(self.api, f'emulated-{next(self.spreadsheet_ids)}', title)
+        self.spreadsheets[title] = spreadsheet
+        return spreadsheet
+
+    def login(self) -> None:
+        self.api.request('login')
+
+    def request(self, method: str, endpoint: str, params: Optional[Dict] = None, **kwargs) -> EmulatedResponse:
+        self.api.request(f'{method} {endpoint}')
+        spreadsheet_id = endpoint.rstrip('/').rsplit('/', 1)[-1]
+        spreadsheet = next(filter(lambda candidate: candidate.id == spreadsheet_id, self.spreadsheets.values()))
+        return EmulatedResponse(200, '', {'id': spreadsheet.id, 'version': str(spreadsheet.version)})
+
+    def open(self, title: str) -> EmulatedSpreadsheet:
+        self.api.request('open')
+        if title not in self.spreadsheets:
+            raise gspread.exceptions.SpreadsheetNotFound(title)
+        return self.spreadsheets[title]
+
+    def create(self, title: str, **kwargs) -> EmulatedSpreadsheet:
+        self.api.request('create')
+        return self.__create(title)
@@ -0,0 +1,71 @@
+import datetime
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from ua_help.common.log import LOGGER
+
+TableRow = List[Tuple[str, str]]
+OutboxEntry = Tuple[int, TableRow]
+
+
+class Outbox:
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        LOGGER.info(f'Open spreadsheet outbox {path}')
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=FULL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                row TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                acknowledged_at TEXT
+            )
+        ''')
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (id) WHERE acknowledged_at IS NULL'
+        )
+
+    def put(self, row: TableRow) -> int:
+        with self.lock:
+            cursor = self.connection.execute(
+                'INSERT INTO outbox (row, created_at) VALUES (?, ?)',
+                (json.dumps(row), datetime.datetime.now().isoformat())
+            )
+            return cursor.lastrowid
+
+    def pending(self, limit: Optional[int] = None) -> List[OutboxEntry]:
+        with self.lock:
+            cursor = self.connection.execute(
+                'SELECT id, row FROM outbox WHERE acknowledged_at IS NULL ORDER BY id LIMIT ?',
+                (-1 if limit is None else limit,)
+            )
+            return list(map(
+                lambda entry: (entry[0], list(map(tuple, json.loads(entry[1])))),
+                cursor.fetchall()
+            ))
+
+    def pending_count(self) -> int:
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM outbox WHERE acknowledged_at IS NULL').fetchone()[0]
+
+    def acknowledge(self, ids: List[int]) -> None:
+        if not ids:
+            return
+        acknowledged_at = datetime.datetime.now().isoformat()
+        with self.lock:
+            self.connection.execute('BEGIN')
+            self.connection.executemany(
+                'UPDATE outbox SET acknowledged_at = ? WHERE id = ?',
+                list(map(lambda row_id: (acknowledged_at, row_id), ids))
+            )
+            self.connection.execute('COMMIT')
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
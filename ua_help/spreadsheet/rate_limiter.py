@@ -0,0 +1,138 @@
+import enum
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque
+
+from ua_help.common.log import LOGGER
+
+
+class QuotaRateLimiter:
+    def __init__(
+            self,
+            writes_per_minute: int = 60,
+            base_backoff: float = 1.0,
+            max_backoff: float = 64.0,
+            min_batch_size: int = 50,
+            max_batch_size: int = 500
+    ):
+        self.writes_per_minute = writes_per_minute
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.batch_size = min_batch_size
+        self.write_times: Deque[float] = deque()
+        self.consecutive_failures = 0
+        self.backoff_until = 0.0
+        self.lock = threading.Lock()
+
+    def __forget_old_writes(self, now: float) -> None:
+        while self.write_times and self.write_times[0] <= now - 60.0:
+            self.write_times.popleft()
+
+    def seconds_to_next_write(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.__forget_old_writes(now)
+            wait_for_quota = 0.0
+            if len(self.write_times) >= self.writes_per_minute:
+                wait_for_quota = self.write_times[0] + 60.0 - now
+            return max(self.backoff_until - now, wait_for_quota, 0.0)
+
+    def record_write(self) -> None:
+        with self.lock:
+            self.write_times.append(time.monotonic())
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.consecutive_failures = 0
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+
+    def record_failure(self, throttled: bool) -> None:
+        with self.lock:
+            self.consecutive_failures += 1
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (self.consecutive_failures - 1))
+            jittered = backoff / 2 + random.uniform(0, backoff / 2)
+            self.backoff_until = time.monotonic() + jittered
+            if throttled:
+                self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+            LOGGER.warning(f'Spreadsheet write failed, back off for {jittered:.1f}s, batch size {self.batch_size}')
+
+
+class CircuitState(enum.Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def seconds_to_next_attempt(self) -> float:
+        with self.lock:
+            if self.state != CircuitState.OPEN:
+                return 0.0
+            return max(self.opened_at + self.recovery_timeout - time.monotonic(), 0.0)
+
+    def allow_request(self) -> bool:
+        with self.lock:
+            if self.state == CircuitState.OPEN and time.monotonic() >= self.opened_at + self.recovery_timeout:
+                LOGGER.info('Spreadsheet circuit breaker is half-open, trying a request')
+                self.state = CircuitState.HALF_OPEN
+            return self.state != CircuitState.OPEN
+
+    def record_success(self) -> None:
+        with self.lock:
+            if self.state != CircuitState.CLOSED:
+                LOGGER.info('Spreadsheet circuit breaker is closed')
+            self.state = CircuitState.CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == CircuitState.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != CircuitState.OPEN:
+                    LOGGER.error(f'Spreadsheet circuit breaker is open for {self.recovery_timeout}s')
+                self.state = CircuitState.OPEN
+                self.opened_at = time.monotonic()
+
+
+class WritePolicy:
+    def __init__(
+            self,
+            rate_limiter: QuotaRateLimiter,
+            circuit_breaker: CircuitBreaker,
+            is_throttling: Callable[[Exception], bool]
+    ):
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.is_throttling = is_throttling
+
+    def seconds_to_next_write(self) -> float:
+        return max(self.rate_limiter.seconds_to_next_write(), self.circuit_breaker.seconds_to_next_attempt())
+
+    def batch_size(self) -> int:
+        return self.rate_limiter.batch_size
+
+    def try_start_write(self) -> bool:
+        if not self.circuit_breaker.allow_request():
+            return False
+        self.rate_limiter.record_write()
+        return True
+
+    def record_success(self) -> None:
+        self.rate_limiter.record_success()
+        self.circuit_breaker.record_success()
+
+    def record_failure(self, error: Exception) -> None:
+        self.rate_limiter.record_failure(self.is_throttling(error))
+        self.circuit_breaker.record_failure()
@@ -0,0 +1,69 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from ua_help.common.log import LOGGER
+from ua_help.spreadsheet.outbox import Outbox
+from ua_help.spreadsheet.spreadsheet_driver import SpreadSheetDriver, TableRow
+from ua_help.spreadsheet.write_behind_queue import WriteBehindQueue
+
+
+class Reconciler:
+    def __init__(self, driver: SpreadSheetDriver, key_name: str):
+        self.driver = driver
+        self.key_name = key_name
+
+    def key_of(self, row: TableRow) -> Optional[str]:
+        return dict(row).get(self.key_name)
+
+    def __key_column(self, row: TableRow) -> Optional[int]:
+        keys = list(map(lambda kv: kv[0], row))
+        return keys.index(self.key_name) + 1 if self.key_name in keys else None
+
+    def __keys_in_sheet(self, rows: List[TableRow]) -> Set[str]:
+        columns = set(filter(lambda column: column is not None, map(self.__key_column, rows)))
+        keys: Set[str] = set()
+        for column in columns:
+            keys |= self.driver.column_values(column)
+        return keys
+
+    def landed(self, rows: List[TableRow]) -> List[bool]:
+        keys_in_sheet = self.__keys_in_sheet(rows)
+        return list(map(lambda row: self.key_of(row) is not None and self.key_of(row) in keys_in_sheet, rows))
+
+    def missing(self, rows: Iterable[TableRow], excluded_keys: Set[str]) -> List[TableRow]:
+        keyed_rows: Dict[str, TableRow] = {}
+        for row in rows:
+            key = self.key_of(row)
+            if key is not None and key not in excluded_keys:
+                keyed_rows[key] = row
+        if not keyed_rows:
+            return []
+        keys_in_sheet = self.__keys_in_sheet(list(keyed_rows.values()))
+        missing_rows = list(map(
+            lambda key: keyed_rows[key],
+            filter(lambda key: key not in keys_in_sheet, keyed_rows.keys())
+        ))
+        LOGGER.info(f'Reconciliation found {len(missing_rows)} of {len(keyed_rows)} submissions missing in the sheet')
+        return missing_rows
+
+
+def reconcile_in_background(
+        reconciler: Reconciler,
+        local_rows: Callable[[], Iterable[TableRow]],
+        outbox: Outbox,
+        queue: WriteBehindQueue
+) -> threading.Thread:
+    def reconcile():
+        try:
+            pending_keys = set(filter(
+                lambda key: key is not None,
+                map(lambda entry: reconciler.key_of(entry[1]), outbox.pending())
+            ))
+            for row in reconciler.missing(local_rows(), pending_keys):
+                queue.put(row)
+        except Exception as e:
+            LOGGER.error(f'Reconciliation failed: {e}')
+
+    thread = threading.Thread(target=reconcile, name='sheet-reconcile', daemon=True)
+    thread.start()
+    return thread
@@ -1,17 +1,72 @@
+import contextlib
+import datetime
+import fcntl
+import re
+import threading
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import Callable, List, Tuple, Dict, Optional, Set
 
 import gspread
+from gspread.urls import DRIVE_FILES_API_V3_URL
 from oauth2client.service_account import ServiceAccountCredentials
 
 from ua_help.common.log import LOGGER
 
+TableRow = List[Tuple[str, str]]
+
+NO_SHARD = ''
+CONNECT_BACKOFF = 1.0
+MAX_CONNECT_BACKOFF = 60.0
+WAIT_READY_TIMEOUT = 30.0
+
 
 class SpreadSheetDriver:
-    def __init__(self, credentials_file_path: Path, spreadsheet_title: str):
-        LOGGER.info(f'Initialize credentials from {credentials_file_path}')
+    def __init__(
+            self,
+            credentials_file_path: Path,
+            spreadsheet_title: str,
+            max_rows_per_worksheet: Optional[int] = None,
+            max_cells_per_spreadsheet: Optional[int] = None,
+            shard_key: Optional[str] = None,
+            refresh_margin: float = 300.0,
+            client_factory: Optional[Callable[[], gspread.Client]] = None,
+            rollover_lock: Optional[Path] = None
+    ):
+        self.credentials_file_path = credentials_file_path
+        self.client_factory = client_factory
+        self.spreadsheet_title = spreadsheet_title
+        self.max_rows_per_worksheet = max_rows_per_worksheet
+        self.max_cells_per_spreadsheet = max_cells_per_spreadsheet
+        self.shard_key = shard_key
+        self.refresh_margin = refresh_margin
+        self.rollover_lock = rollover_lock
+        self.lock = threading.Lock()
+        self.connect_lock = threading.Lock()
+        self.connected = threading.Event()
+        self.stopped = threading.Event()
+        self.spreadsheet_index = 1
+        self.credentials: Optional[ServiceAccountCredentials] = None
+        self.client: Optional[gspread.Client] = None
+        self.spreadsheet: Optional[gspread.Spreadsheet] = None
+        self.sheet: Optional[gspread.Worksheet] = None
+        self.keyed_layouts: Dict[Tuple[str, str, str, str], Tuple[str, str]] = {}
+        self.row_keys: Dict[Tuple[str, str], List[str]] = {}
+        self.__reset_spreadsheet_cache()
+        threading.Thread(target=self.__connect_in_background, name='sheet-connect', daemon=True).start()
+
+    def is_ready(self) -> bool:
+        return self.connected.is_set()
+
+    def wait_ready(self, timeout: float = WAIT_READY_TIMEOUT) -> bool:
+        return self.connected.wait(timeout)
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def __authorize(self) -> gspread.Client:
+        LOGGER.info(f'Initialize credentials from {self.credentials_file_path}')
         self.credentials = ServiceAccountCredentials.from_json_keyfile_name(
-            str(credentials_file_path),
+            str(self.credentials_file_path),
             [
                 'https://www.googleapis.com/auth/drive',
                 'https://www.googleapis.com/auth/drive.file'
@@ -19,10 +74,315 @@ class SpreadSheetDriver:
         )
         LOGGER.info(f'Spreadsheet credentials initialized')
         LOGGER.info('Spreadsheet initializing client with credentials')
-        self.client = gspread.authorize(self.credentials)
+        client = gspread.authorize(self.credentials)
         LOGGER.info('Spreadsheet client initialized')
-        self.sheet = self.client.open(spreadsheet_title).sheet1
+        return client
+
+    def __connect(self) -> None:
+        with self.connect_lock:
+            if self.connected.is_set():
+                return
+            self.client = self.__authorize() if self.client_factory is None else self.client_factory()
+            self.spreadsheet = self.client.open(self.spreadsheet_title)
+            self.sheet = self.spreadsheet.sheet1
+            self.__reset_spreadsheet_cache()
+            self.connected.set()
+            LOGGER.info(f'Spreadsheet "{self.spreadsheet_title}" is ready')
+        threading.Thread(target=self.__refresh_credentials_periodically, name='sheet-refresh', daemon=True).start()
+
+    def __connect_in_background(self) -> None:
+        backoff = CONNECT_BACKOFF
+        while not self.stopped.is_set():
+            try:
+                self.__connect()
+                return
+            except Exception as e:
+                LOGGER.error(f'Spreadsheet connection failed, retry in {backoff:.0f}s: {e}')
+            if self.stopped.wait(backoff):
+                return
+            backoff = min(backoff * 2, MAX_CONNECT_BACKOFF)
+
+    def __seconds_to_refresh(self) -> float:
+        expiry = self.client.auth.expiry
+        if expiry is None:
+            return 60.0
+        return max((expiry - datetime.datetime.utcnow()).total_seconds() - self.refresh_margin, 0.0)
+
+    def __refresh_credentials_periodically(self) -> None:
+        while not self.stopped.wait(self.__seconds_to_refresh()):
+            try:
+                self.client.login()
+                LOGGER.info(f'Spreadsheet credentials refreshed, valid until {self.client.auth.expiry}')
+            except Exception as e:
+                LOGGER.error(f'Spreadsheet credentials refresh failed: {e}')
+                if self.stopped.wait(60.0):
+                    return
+
+    def __reset_spreadsheet_cache(self) -> None:
+        self.all_worksheets: Optional[Dict[str, gspread.Worksheet]] = None
+        self.current_worksheets: Dict[str, gspread.Worksheet] = {}
+        self.row_counts: Dict[str, int] = {}
+        self.cells_used: Optional[int] = None
+
+    def __worksheets_by_title(self) -> Dict[str, gspread.Worksheet]:
+        if self.all_worksheets is None:
+            worksheets = self.spreadsheet.worksheets()
+            self.all_worksheets = {worksheet.title: worksheet for worksheet in worksheets}
+            self.cells_used = sum(map(lambda worksheet: worksheet.row_count * worksheet.col_count, worksheets))
+        return self.all_worksheets
+
+    def __rows_in(self, worksheet: gspread.Worksheet) -> int:
+        if worksheet.title not in self.row_counts:
+            self.row_counts[worksheet.title] = len(worksheet.col_values(1))
+        return self.row_counts[worksheet.title]
+
+    def __shard_base_title(self, shard: str) -> str:
+        return self.sheet.title if shard == NO_SHARD else shard
+
+    @contextlib.contextmanager
+    def __rollover_locked(self):
+        if self.rollover_lock is None or (self.max_rows_per_worksheet is None and self.max_cells_per_spreadsheet is None):
+            yield
+            return
+        self.rollover_lock.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.rollover_lock, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self.__reset_spreadsheet_cache()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def __rollover_title(base_title: str, index: int) -> str:
+        return base_title if index == 1 else f'{base_title} ({index})'
+
+    def __latest_worksheet_title(self, base_title: str) -> Tuple[str, int]:
+        worksheets = self.__worksheets_by_title()
+        index = 1
+        while self.__rollover_title(base_title, index + 1) in worksheets:
+            index += 1
+        return self.__rollover_title(base_title, index), index
 
-    def append_row(self, row: List[Tuple[str, str]]) -> Dict[str, str]:
+    def __open_or_create_worksheet(self, title: str, header: List[str]) -> gspread.Worksheet:
+        worksheets = self.__worksheets_by_title()
+        if title in worksheets:
+            return worksheets[title]
+        LOGGER.info(f'Spreadsheet creates worksheet "{title}"')
+        worksheet = self.spreadsheet.add_worksheet(title, rows=1, cols=len(header))
+        worksheet.append_row(header)
+        worksheets[title] = worksheet
+        self.row_counts[title] = 1
+        self.cells_used += len(header)
+        return worksheet
+
+    def __roll_spreadsheet(self) -> None:
+        self.spreadsheet_index += 1
+        title = self.__rollover_title(self.spreadsheet_title, self.spreadsheet_index)
+        LOGGER.info(f'Spreadsheet rolls over to "{title}"')
+        try:
+            self.spreadsheet = self.client.open(title)
+        except gspread.exceptions.SpreadsheetNotFound:
+            previous_permissions = self.spreadsheet.list_permissions()
+            self.spreadsheet = self.client.create(title)
+            for permission in previous_permissions:
+                if 'emailAddress' in permission and permission['role'] != 'owner':
+                    self.spreadsheet.share(permission['emailAddress'], permission['type'], permission['role'], notify=False)
+        self.__reset_spreadsheet_cache()
+
+    def __worksheet_for(self, shard: str, header: List[str], n_rows: int) -> gspread.Worksheet:
+        self.__worksheets_by_title()
+        if self.max_cells_per_spreadsheet is not None \
+                and self.cells_used + n_rows * len(header) > self.max_cells_per_spreadsheet:
+            self.__roll_spreadsheet()
+
+        if shard not in self.current_worksheets:
+            title, _ = self.__latest_worksheet_title(self.__shard_base_title(shard))
+            self.current_worksheets[shard] = self.__open_or_create_worksheet(title, header)
+
+        worksheet = self.current_worksheets[shard]
+        if self.max_rows_per_worksheet is not None and self.__rows_in(worksheet) >= self.max_rows_per_worksheet:
+            _, index = self.__latest_worksheet_title(self.__shard_base_title(shard))
+            next_title = self.__rollover_title(self.__shard_base_title(shard), index + 1)
+            LOGGER.info(f'Worksheet "{worksheet.title}" is full, roll over to "{next_title}"')
+            worksheet = self.__open_or_create_worksheet(next_title, header)
+            self.current_worksheets[shard] = worksheet
+        return worksheet
+
+    def __shard_of(self, row: TableRow) -> str:
+        if self.shard_key is None:
+            return NO_SHARD
+        values = dict(row)
+        shard = re.sub(r'[\[\]\\*?:/\']', '', values.get(self.shard_key, '')).strip()
+        return shard if shard else NO_SHARD
+
+    def __append_shard(self, shard: str, rows: List[TableRow]) -> Dict[str, str]:
+        header = list(map(lambda kv: kv[0], rows[0]))
+        values = list(map(lambda row: list(map(lambda kv: kv[1], row)), rows))
+        response = {}
+        while values:
+            with self.__rollover_locked():
+                worksheet = self.__worksheet_for(shard, header, min(len(values), self.max_rows_per_worksheet or len(values)))
+                capacity = len(values) if self.max_rows_per_worksheet is None \
+                    else max(self.max_rows_per_worksheet - self.__rows_in(worksheet), 1)
+                chunk, values = values[:capacity], values[capacity:]
+                response = worksheet.append_rows(chunk)
+                if worksheet.title in self.row_counts:
+                    self.row_counts[worksheet.title] += len(chunk)
+                self.cells_used += len(chunk) * len(header)
+        return response
+
+    def append_row(self, row: TableRow) -> Dict[str, str]:
         LOGGER.debug(f'Spreadsheet append row: {row}')
-        return self.sheet.append_row(list(map(lambda kv: kv[1], row)))
+        return self.append_rows([row])
+
+    def append_rows(self, rows: List[TableRow]) -> Dict[str, str]:
+        LOGGER.debug(f'Spreadsheet append {len(rows)} rows')
+        shards: Dict[str, List[TableRow]] = {}
+        for row in rows:
+            shards.setdefault(self.__shard_of(row), []).append(row)
+        response = {}
+        self.__connect()
+        with self.lock:
+            for shard, shard_rows in shards.items():
+                response = self.__append_shard(shard, shard_rows)
+        return response
+
+    def __rolled_spreadsheets(self) -> List[gspread.Spreadsheet]:
+        if self.max_cells_per_spreadsheet is None:
+            return [self.spreadsheet]
+        spreadsheets = []
+        index = 1
+        while True:
+            title = self.__rollover_title(self.spreadsheet_title, index)
+            try:
+                spreadsheets.append(self.spreadsheet if index == self.spreadsheet_index else self.client.open(title))
+            except gspread.exceptions.SpreadsheetNotFound:
+                return spreadsheets
+            index += 1
+
+    def column_values(self, column: int) -> Set[str]:
+        self.__connect()
+        letter = re.sub(r'\d', '', gspread.utils.rowcol_to_a1(1, column))
+        values = set()
+        with self.lock:
+            for spreadsheet in self.__rolled_spreadsheets():
+                titles = list(map(lambda worksheet: worksheet.title, spreadsheet.worksheets()))
+                response = spreadsheet.values_batch_get(list(map(
+                    lambda title: f"'{title.replace(chr(39), chr(39) * 2)}'!{letter}:{letter}",
+                    titles
+                )))
+                for value_range in response.get('valueRanges', []):
+                    for row in value_range.get('values', []):
+                        if row:
+                            values.add(row[0])
+        return values
+
+    def revisions(self) -> Dict[str, str]:
+        self.__connect()
+        with self.lock:
+            spreadsheets = self.__rolled_spreadsheets()
+        return {
+            spreadsheet.id: str(self.client.request(
+                'get',
+                f'{DRIVE_FILES_API_V3_URL}/{spreadsheet.id}',
+                params={'fields': 'version', 'supportsAllDrives': True}
+            ).json()['version'])
+            for spreadsheet in spreadsheets
+        }
+
+    @staticmethod
+    def __quoted_title(title: str) -> str:
+        return title.replace("'", "''")
+
+    @staticmethod
+    def __column_letter(header: List[str], column_header: str) -> str:
+        return re.sub(r'\d', '', gspread.utils.rowcol_to_a1(1, header.index(column_header) + 1))
+
+    def __keyed_layouts(
+            self,
+            spreadsheet: gspread.Spreadsheet,
+            titles: List[str],
+            key_header: str,
+            value_header: str
+    ) -> Dict[str, Tuple[str, str]]:
+        missing = list(filter(lambda title: (spreadsheet.id, title, key_header, value_header) not in self.keyed_layouts, titles))
+        if missing:
+            headers = spreadsheet.values_batch_get(list(map(lambda title: f"'{self.__quoted_title(title)}'!1:1", missing)))
+            for title, header_range in zip(missing, headers.get('valueRanges', [])):
+                header_rows = header_range.get('values', [])
+                header = header_rows[0] if header_rows else []
+                if key_header in header and value_header in header:
+                    self.keyed_layouts[(spreadsheet.id, title, key_header, value_header)] = (
+                        self.__column_letter(header, key_header),
+                        self.__column_letter(header, value_header)
+                    )
+        return {
+            title: self.keyed_layouts[(spreadsheet.id, title, key_header, value_header)]
+            for title in titles
+            if (spreadsheet.id, title, key_header, value_header) in self.keyed_layouts
+        }
+
+    def __read_new_keys(
+            self,
+            spreadsheet: gspread.Spreadsheet,
+            layouts: Dict[str, Tuple[str, str]]
+    ) -> List[str]:
+        ranges = []
+        for title, (key_letter, _) in layouts.items():
+            known = self.row_keys.get((spreadsheet.id, title), [])
+            ranges.append(f"'{self.__quoted_title(title)}'!{key_letter}{len(known) + 1 if known else 2}:{key_letter}")
+        response = spreadsheet.values_batch_get(ranges).get('valueRanges', [])
+        shifted = []
+        for title, key_range in zip(layouts.keys(), response):
+            known = self.row_keys.setdefault((spreadsheet.id, title), [])
+            keys = list(map(lambda cell: cell[0] if cell else '', key_range.get('values', [])))
+            if known:
+                if not keys or keys[0] != known[-1]:
+                    shifted.append(title)
+                    continue
+                keys = keys[1:]
+            known.extend(keys)
+        return shifted
+
+    def keyed_column_values(
+            self,
+            key_header: str,
+            value_header: str,
+            spreadsheet_ids: Optional[Set[str]] = None
+    ) -> Dict[str, str]:
+        self.__connect()
+        keyed_values = {}
+        with self.lock:
+            for spreadsheet in self.__rolled_spreadsheets():
+                if spreadsheet_ids is not None and spreadsheet.id not in spreadsheet_ids:
+                    continue
+                titles = list(map(lambda worksheet: worksheet.title, spreadsheet.worksheets()))
+                self.row_keys = dict(filter(
+                    lambda kv: kv[0][0] != spreadsheet.id or kv[0][1] in titles,
+                    self.row_keys.items()
+                ))
+                layouts = self.__keyed_layouts(spreadsheet, titles, key_header, value_header)
+                if not layouts:
+                    continue
+                shifted = self.__read_new_keys(spreadsheet, layouts)
+                if shifted:
+                    LOGGER.info(f'Rows moved in worksheets {shifted}, re-read their keys')
+                    for title in shifted:
+                        del self.row_keys[(spreadsheet.id, title)]
+                    self.__read_new_keys(spreadsheet, {title: layouts[title] for title in shifted})
+                values = spreadsheet.values_batch_get(list(map(
+                    lambda title: f"'{self.__quoted_title(title)}'!{layouts[title][1]}2:{layouts[title][1]}",
+                    layouts.keys()
+                ))).get('valueRanges', [])
+                for title, value_range in zip(layouts.keys(), values):
+                    cells = value_range.get('values', [])
+                    for i, key in enumerate(self.row_keys[(spreadsheet.id, title)]):
+                        if key:
+                            value_cell = cells[i] if i < len(cells) else []
+                            keyed_values[key] = value_cell[0] if value_cell else ''
+        return keyed_values
+
+    @staticmethod
+    def is_throttling_error(error: Exception) -> bool:
+        return isinstance(error, gspread.exceptions.APIError) and error.response.status_code == 429
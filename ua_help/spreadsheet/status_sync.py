@@ -0,0 +1,103 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from ua_help.common.log import LOGGER
+from ua_help.spreadsheet.spreadsheet_driver import SpreadSheetDriver
+
+StatusListener = Callable[[str, str], None]
+
+
+class StatusIndex:
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS statuses (key TEXT PRIMARY KEY, status TEXT NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.statuses: Dict[str, str] = dict(self.connection.execute('SELECT key, status FROM statuses').fetchall())
+
+    def revisions(self) -> Optional[Dict[str, str]]:
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE name = 'revisions'").fetchone()
+            return None if row is None else json.loads(row[0])
+
+    def changed(self, statuses: Dict[str, str]) -> Dict[str, str]:
+        return dict(filter(lambda kv: self.statuses.get(kv[0], '') != kv[1], statuses.items()))
+
+    def update(self, changes: Dict[str, str], revisions: Dict[str, str]) -> None:
+        with self.lock:
+            self.connection.execute('BEGIN')
+            self.connection.executemany(
+                'INSERT INTO statuses (key, status) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET status = excluded.status',
+                list(changes.items())
+            )
+            self.connection.execute(
+                "INSERT INTO meta (name, value) VALUES ('revisions', ?) ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+                (json.dumps(revisions),)
+            )
+            self.connection.execute('COMMIT')
+            self.statuses.update(changes)
+
+
+class StatusPoller:
+    def __init__(
+            self,
+            driver: SpreadSheetDriver,
+            index: StatusIndex,
+            key_header: str,
+            status_header: str,
+            listener: StatusListener,
+            interval: float = 60.0
+    ):
+        self.driver = driver
+        self.index = index
+        self.key_header = key_header
+        self.status_header = status_header
+        self.listener = listener
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.worker = threading.Thread(target=self.__run, name='sheet-status-poll', daemon=True)
+
+    def start(self) -> 'StatusPoller':
+        self.worker.start()
+        return self
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def poll_once(self) -> int:
+        revisions = self.driver.revisions()
+        known_revisions = self.index.revisions()
+        changed_ids = set(filter(
+            lambda spreadsheet_id: (known_revisions or {}).get(spreadsheet_id) != revisions[spreadsheet_id],
+            revisions
+        ))
+        if not changed_ids:
+            return 0
+        changes = self.index.changed(
+            self.driver.keyed_column_values(self.key_header, self.status_header, changed_ids)
+        )
+        self.index.update(changes, revisions)
+        LOGGER.info(f'Sheet revisions {revisions}: {len(changes)} statuses changed in {len(changed_ids)} spreadsheets')
+        seeded = known_revisions is not None
+        if not seeded:
+            LOGGER.info('Status index seeded without notifications')
+            return 0
+        for key, status in changes.items():
+            if status:
+                try:
+                    self.listener(key, status)
+                except Exception as e:
+                    LOGGER.error(f'Status listener failed for {key}: {e}')
+        return len(changes)
+
+    def __run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            try:
+                self.poll_once()
+            except Exception as e:
+                LOGGER.error(f'Status poll failed: {e}')
@@ -0,0 +1,215 @@
+import datetime
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from ua_help.common.log import LOGGER
+from ua_help.exception.categorized_exception import ToFailException
+from ua_help.spreadsheet.outbox import Outbox
+from ua_help.spreadsheet.rate_limiter import WritePolicy
+
+TableRow = List[Tuple[str, str]]
+BulkConsumer = Callable[[List[TableRow]], None]
+LandedFinder = Callable[[List[TableRow]], List[bool]]
+QueuedRow = Tuple[float, Optional[int], TableRow, bool]
+
+ACKNOWLEDGE_ATTEMPTS = 5
+ACKNOWLEDGE_BACKOFF = 0.5
+
+
+class WriteBehindQueue:
+    def __init__(
+            self,
+            bulk_consumer: BulkConsumer,
+            max_batch_size: int = 50,
+            flush_interval: float = 2.0,
+            retry_interval: float = 10.0,
+            outbox: Optional[Outbox] = None,
+            policy: Optional[WritePolicy] = None,
+            find_landed: Optional[LandedFinder] = None
+    ):
+        self.bulk_consumer = bulk_consumer
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.outbox = outbox
+        self.policy = policy
+        self.find_landed = find_landed
+        self.rows: Deque[QueuedRow] = deque()
+        self.in_flight = 0
+        self.flush_requested = False
+        self.stopped = False
+        self.retry_at = 0.0
+        self.condition = threading.Condition()
+        self.worker = threading.Thread(target=self.__run, name='sheet-write-behind', daemon=True)
+
+    def start(self) -> 'WriteBehindQueue':
+        self.__replay_outbox()
+        self.worker.start()
+        return self
+
+    def put(self, row: TableRow) -> Dict[str, str]:
+        if self.stopped:
+            raise ToFailException('WriteBehindQueue', 'queue is already stopped')
+        row_id = None if self.outbox is None else self.outbox.put(row)
+        self.__enqueue([(row_id, row)])
+        LOGGER.debug(f'Write-behind queue accepted row {row_id}, depth: {self.queue_depth()}')
+        receipt = {
+            'status': 'queued',
+            'queued_at': datetime.datetime.now().isoformat()
+        }
+        if row_id is not None:
+            receipt['outbox_id'] = str(row_id)
+        return receipt
+
+    def adopt(self, outbox: Outbox) -> int:
+        pending = outbox.pending()
+        if pending:
+            rows = list(map(
+                lambda entry: (None if self.outbox is None else self.outbox.put(entry[1]), entry[1]),
+                pending
+            ))
+            outbox.acknowledge(list(map(lambda entry: entry[0], pending)))
+            self.__enqueue(rows, uncertain=True)
+            LOGGER.info(f'Write-behind queue adopted {len(pending)} unacknowledged rows from another outbox')
+        return len(pending)
+
+    def queue_depth(self) -> int:
+        with self.condition:
+            return len(self.rows) + self.in_flight
+
+    def flush(self) -> None:
+        with self.condition:
+            self.flush_requested = True
+            self.condition.notify_all()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            self.flush_requested = True
+            self.condition.notify_all()
+            while self.rows or self.in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            return not self.rows and not self.in_flight
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        drained = self.drain(timeout)
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        if not drained:
+            LOGGER.error(f'Write-behind queue stopped with {self.queue_depth()} rows not written')
+        return drained
+
+    def __enqueue(self, rows: List[Tuple[Optional[int], TableRow]], uncertain: bool = False) -> None:
+        now = time.monotonic()
+        with self.condition:
+            self.rows.extend(map(lambda entry: (now, entry[0], entry[1], uncertain), rows))
+            self.condition.notify_all()
+
+    def __replay_outbox(self) -> None:
+        if self.outbox is None:
+            return
+        pending = self.outbox.pending()
+        if pending:
+            LOGGER.info(f'Write-behind queue replays {len(pending)} unacknowledged rows from outbox')
+            self.__enqueue(pending, uncertain=True)
+
+    def __batch_size(self) -> int:
+        if self.policy is None:
+            return self.max_batch_size
+        return max(self.max_batch_size, self.policy.batch_size())
+
+    def __seconds_to_batch(self) -> Optional[float]:
+        if not self.rows:
+            return None
+        now = time.monotonic()
+        wait_for_policy = 0.0 if self.policy is None else self.policy.seconds_to_next_write()
+        if now < self.retry_at or wait_for_policy > 0:
+            return max(self.retry_at - now, wait_for_policy)
+        if len(self.rows) >= self.__batch_size() or self.flush_requested or self.stopped:
+            return 0.0
+        oldest_enqueued_at = self.rows[0][0]
+        return max(oldest_enqueued_at + self.flush_interval - now, 0.0)
+
+    def __take_batch(self) -> Optional[List[QueuedRow]]:
+        with self.condition:
+            while True:
+                wait_for = self.__seconds_to_batch()
+                if wait_for == 0.0:
+                    break
+                if wait_for is None and self.stopped:
+                    return None
+                self.condition.wait(wait_for)
+            batch_size = min(self.__batch_size(), len(self.rows))
+            batch = [self.rows.popleft() for _ in range(batch_size)]
+            self.in_flight = len(batch)
+            if not self.rows:
+                self.flush_requested = False
+            if self.policy is not None and not self.policy.try_start_write():
+                self.rows.extendleft(reversed(batch))
+                self.in_flight = 0
+                return []
+            return batch
+
+    def __acknowledge(self, batch: List[QueuedRow]) -> None:
+        if self.outbox is None:
+            return
+        row_ids = list(filter(lambda row_id: row_id is not None, map(lambda row: row[1], batch)))
+        for attempt in range(1, ACKNOWLEDGE_ATTEMPTS + 1):
+            try:
+                self.outbox.acknowledge(row_ids)
+                return
+            except Exception as e:
+                LOGGER.warning(f'Outbox failed to acknowledge {len(row_ids)} written rows, attempt {attempt}: {e}')
+                time.sleep(ACKNOWLEDGE_BACKOFF * attempt)
+        LOGGER.error(f'Outbox keeps {len(row_ids)} written rows unacknowledged, they are reconciled on replay')
+
+    def __drop_landed(self, batch: List[QueuedRow]) -> List[QueuedRow]:
+        uncertain = list(filter(lambda row: row[3], batch))
+        if self.find_landed is None or not uncertain:
+            return batch
+        uncertain_landed = iter(self.find_landed(list(map(lambda row: row[2], uncertain))))
+        landed = list(map(lambda row: row[3] and next(uncertain_landed), batch))
+        already_written = list(map(lambda pair: pair[0], filter(lambda pair: pair[1], zip(batch, landed))))
+        if already_written:
+            LOGGER.info(f'Write-behind queue skips {len(already_written)} rows already present in the sheet')
+            self.__acknowledge(already_written)
+        return list(map(lambda pair: pair[0], filter(lambda pair: not pair[1], zip(batch, landed))))
+
+    def __complete_batch(self, batch: List[QueuedRow], succeeded: bool) -> None:
+        if succeeded:
+            self.__acknowledge(batch)
+        with self.condition:
+            self.in_flight = 0
+            if not succeeded:
+                self.rows.extendleft(reversed(list(map(lambda row: (row[0], row[1], row[2], True), batch))))
+                if self.policy is None:
+                    self.retry_at = time.monotonic() + self.retry_interval
+            self.condition.notify_all()
+
+    def __run(self) -> None:
+        while True:
+            batch = self.__take_batch()
+            if batch is None:
+                return
+            if not batch:
+                continue
+            try:
+                batch = self.__drop_landed(batch)
+                if batch:
+                    LOGGER.info(f'Write-behind queue flushes {len(batch)} rows')
+                    self.bulk_consumer(list(map(lambda row: row[2], batch)))
+                    if self.policy is not None:
+                        self.policy.record_success()
+            except Exception as e:
+                LOGGER.error(f'Write-behind queue failed to flush {len(batch)} rows: {e}')
+                if self.policy is not None:
+                    self.policy.record_failure(e)
+                self.__complete_batch(batch, False)
+                continue
+            self.__complete_batch(batch, True)
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from telegram import Update
+
+from ua_help.common.log import LOGGER
+from ua_help.telegram.send_scheduler import TokenBucket
+from ua_help.telegram.sharding import update_chat_id
+
+MAX_TRACKED_CHATS = 10000
+TOP_OFFENDERS = 5
+
+
+class AdmissionControl:
+    def __init__(
+            self,
+            per_chat_rate: float = 2.0,
+            per_chat_burst: float = 5.0,
+            max_in_flight: int = 200,
+            is_collapsible: Optional[Callable[[str], bool]] = None,
+            on_shed: Optional[Callable[[Update], None]] = None
+    ):
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_in_flight = max_in_flight
+        self.is_collapsible = is_collapsible if is_collapsible is not None else lambda data: False
+        self.on_shed = on_shed if on_shed is not None else lambda update: None
+        self.lock = threading.Lock()
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        self.latest_callbacks: Dict[Tuple[int, int], int] = {}
+        self.in_flight = 0
+        self.admitted_count = 0
+        self.collapsed_count = 0
+        self.shed_counts: Counter = Counter()
+        self.shed_by_chat: Counter = Counter()
+
+    def __callback_key(self, update: Update) -> Optional[Tuple[int, int]]:
+        query = update.callback_query
+        if query is None or query.message is None or not self.is_collapsible(query.data or ''):
+            return None
+        return query.message.chat_id, query.message.message_id
+
+    def __chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        if chat_id not in self.chat_buckets:
+            if len(self.chat_buckets) > MAX_TRACKED_CHATS:
+                self.chat_buckets = dict(filter(lambda kv: not kv[1].is_idle(now), self.chat_buckets.items()))
+            self.chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        return self.chat_buckets[chat_id]
+
+    def __shed(self, chat_id: int, reason: str) -> None:
+        self.shed_counts[reason] += 1
+        self.shed_by_chat[chat_id] += 1
+        LOGGER.debug(f'Shed update of chat {chat_id}: {reason}')
+
+    def admit(self, update: Update) -> bool:
+        chat_id = update_chat_id(update)
+        key = self.__callback_key(update)
+        with self.lock:
+            now = time.monotonic()
+            bucket = self.__chat_bucket(chat_id, now)
+            if self.in_flight >= self.max_in_flight:
+                reason = 'overload'
+            elif bucket.seconds_until(now) > 0:
+                reason = 'rate_limited'
+            else:
+                reason = None
+                bucket.take()
+                if key is not None:
+                    self.latest_callbacks[key] = update.update_id
+                self.in_flight += 1
+                self.admitted_count += 1
+            if reason is not None:
+                self.__shed(chat_id, reason)
+        if reason is not None:
+            self.on_shed(update)
+            return False
+        return True
+
+    def run(self, update: Update, job: Callable[[], Any]) -> None:
+        key = self.__callback_key(update)
+        try:
+            with self.lock:
+                superseded = key is not None and self.latest_callbacks.get(key) != update.update_id
+                if superseded:
+                    self.collapsed_count += 1
+            if superseded:
+                self.on_shed(update)
+            else:
+                job()
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                if key is not None and self.latest_callbacks.get(key) == update.update_id:
+                    del self.latest_callbacks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'admitted': self.admitted_count,
+                'in_flight': self.in_flight,
+                'collapsed': self.collapsed_count,
+                'shed': dict(self.shed_counts),
+                'top_shed_chats': self.shed_by_chat.most_common(TOP_OFFENDERS)
+            }
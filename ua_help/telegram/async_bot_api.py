@@ -0,0 +1,85 @@
+import json
+from typing import Any, Dict, Optional
+
+from telegram.error import BadRequest, ChatMigrated, Conflict, NetworkError, RetryAfter, TimedOut, Unauthorized
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+
+TELEGRAM_API_URL = 'https://api.telegram.org/bot'
+JSON_ENCODED_PARAMETERS = {'reply_markup', 'entities', 'caption_entities'}
+
+
+def api_method(name: str) -> str:
+    head, *tail = name.split('_')
+    return head + ''.join(map(str.capitalize, tail))
+
+
+class AsyncBotApi:
+    def __init__(
+            self,
+            token: str,
+            base_url: str = TELEGRAM_API_URL,
+            max_clients: int = 100,
+            connect_timeout: float = 5.0,
+            request_timeout: float = 10.0
+    ):
+        self.url = f'{base_url}{token}/'
+        self.max_clients = max_clients
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+        self.client: Optional[AsyncHTTPClient] = None
+
+    @staticmethod
+    def __encode(params: Dict[str, Any]) -> str:
+        body = {}
+        for name, value in params.items():
+            if value is None:
+                continue
+            if name in JSON_ENCODED_PARAMETERS and isinstance(value, str):
+                value = json.loads(value)
+            elif hasattr(value, 'to_dict'):
+                value = value.to_dict()
+            body[name] = value
+        return json.dumps(body, ensure_ascii=False)
+
+    async def call(self, method: str, **params) -> Any:
+        if self.client is None:
+            self.client = AsyncHTTPClient(force_instance=True, max_clients=self.max_clients)
+        response = await self.client.fetch(
+            HTTPRequest(
+                f'{self.url}{api_method(method)}',
+                method='POST',
+                body=self.__encode(params),
+                headers={'Content-Type': 'application/json'},
+                connect_timeout=self.connect_timeout,
+                request_timeout=self.request_timeout
+            ),
+            raise_error=False
+        )
+        if response.code == 599:
+            if 'timeout' in str(response.error).lower():
+                raise TimedOut()
+            raise NetworkError(f'Telegram request failed: {response.error}')
+        try:
+            data = json.loads(response.body)
+        except ValueError:
+            raise NetworkError(f'Invalid Telegram response with status {response.code}')
+        if data.get('ok'):
+            return data.get('result')
+
+        description = data.get('description', 'Unknown Telegram error')
+        parameters = data.get('parameters') or {}
+        if 'retry_after' in parameters:
+            raise RetryAfter(parameters['retry_after'])
+        if 'migrate_to_chat_id' in parameters:
+            raise ChatMigrated(parameters['migrate_to_chat_id'])
+        if response.code in (401, 403):
+            raise Unauthorized(description)
+        if response.code == 400:
+            raise BadRequest(description)
+        if response.code == 409:
+            raise Conflict(description)
+        raise NetworkError(f'{description} ({response.code})')
+
+    def close(self) -> None:
+        if self.client is not None:
+            self.client.close()
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from ua_help.common.log import LOGGER
+
+Job = Callable[[], None]
+LATENCY_WINDOW = 1000
+
+
+class AsyncRuntime:
+    def __init__(self, executor_workers: int = 8, io_workers: int = 8, lane_idle_timeout: float = 30.0):
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix='tg-async-handler')
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='tg-async-io')
+        self.lane_idle_timeout = lane_idle_timeout
+        self.lanes: Dict[int, asyncio.Queue] = {}
+        self.thread = threading.Thread(target=self.__run_loop, name='tg-asyncio', daemon=True)
+        self.stats_lock = threading.Lock()
+        self.queue_waits: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.submitted_count = 0
+        self.handled_count = 0
+        self.failed_count = 0
+
+    def __run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.set_default_executor(self.io_executor)
+        self.loop.run_forever()
+
+    def start(self) -> 'AsyncRuntime':
+        self.thread.start()
+        return self
+
+    def submit(self, chat_id: int, job: Job) -> None:
+        with self.stats_lock:
+            self.submitted_count += 1
+        self.loop.call_soon_threadsafe(self.__enqueue, chat_id, (time.monotonic(), job))
+
+    def run_coroutine(self, coroutine: Awaitable[Any]) -> Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def __enqueue(self, chat_id: int, item: Tuple[float, Job]) -> None:
+        lane = self.lanes.get(chat_id)
+        if lane is None:
+            lane = asyncio.Queue()
+            self.lanes[chat_id] = lane
+            self.loop.create_task(self.__run_lane(chat_id, lane))
+        lane.put_nowait(item)
+
+    async def __run_lane(self, chat_id: int, lane: asyncio.Queue) -> None:
+        while True:
+            try:
+                submitted_at, job = await asyncio.wait_for(lane.get(), self.lane_idle_timeout)
+            except asyncio.TimeoutError:
+                if lane.empty():
+                    del self.lanes[chat_id]
+                    return
+                continue
+            started_at = time.monotonic()
+            failed = False
+            try:
+                await self.loop.run_in_executor(self.executor, job)
+            except Exception as e:
+                failed = True
+                LOGGER.error(f'Handler for chat {chat_id} failed: {e}')
+            with self.stats_lock:
+                self.queue_waits.append(started_at - submitted_at)
+                self.handled_count += 1
+                self.failed_count += int(failed)
+
+    async def __cancel_tasks(self) -> None:
+        tasks = list(filter(lambda task: task is not asyncio.current_task(), asyncio.all_tasks()))
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.lanes.clear()
+
+    def pending_count(self) -> int:
+        with self.stats_lock:
+            return self.submitted_count - self.handled_count
+
+    def stats(self) -> Dict[str, float]:
+        with self.stats_lock:
+            waits = sorted(self.queue_waits)
+            submitted, handled, failed = self.submitted_count, self.handled_count, self.failed_count
+
+        def percentile(q: float) -> float:
+            return waits[min(len(waits) - 1, int(q * len(waits)))] if waits else 0.0
+
+        return {
+            'submitted': submitted,
+            'handled': handled,
+            'failed': failed,
+            'lanes': len(self.lanes),
+            'queue_wait_p50': percentile(0.5),
+            'queue_wait_p99': percentile(0.99)
+        }
+
+    def drain(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while self.pending_count() > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.pending_count() == 0
+
+    def stop(self, timeout: float = 10.0, before_stop: Optional[Callable[[], Awaitable[None]]] = None) -> None:
+        if not self.drain(timeout):
+            LOGGER.warning(f'Async runtime stopped with {self.pending_count()} updates left unhandled')
+        if before_stop is not None:
+            try:
+                self.run_coroutine(before_stop()).result(timeout=timeout)
+            except Exception as e:
+                LOGGER.warning(f'Async runtime shutdown hook failed: {e}')
+        self.run_coroutine(self.__cancel_tasks()).result(timeout=timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=1.0)
+        self.loop.close()
+        self.executor.shutdown(wait=False)
+        self.io_executor.shutdown(wait=False)
+        LOGGER.info(f'Async runtime stats: {self.stats()}')
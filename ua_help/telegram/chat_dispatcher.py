@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from ua_help.common.log import LOGGER
+
+Job = Callable[[], None]
+LATENCY_WINDOW = 1000
+
+
+class ChatDispatcher:
+    def __init__(self, workers: int = 8):
+        self.chats: Dict[int, Deque[Tuple[float, Job]]] = {}
+        self.ready: Deque[int] = deque()
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.workers = list(map(
+            lambda i: threading.Thread(target=self.__run, name=f'tg-dispatch-{i}', daemon=True),
+            range(workers)
+        ))
+        self.queue_waits: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.max_queue_wait = 0.0
+        self.submitted_count = 0
+        self.handled_count = 0
+        self.failed_count = 0
+
+    def start(self) -> 'ChatDispatcher':
+        for worker in self.workers:
+            worker.start()
+        return self
+
+    def submit(self, chat_id: int, job: Job) -> None:
+        with self.condition:
+            self.submitted_count += 1
+            queue = self.chats.get(chat_id)
+            if queue is None:
+                queue = deque()
+                self.chats[chat_id] = queue
+                self.ready.append(chat_id)
+                self.condition.notify_all()
+            queue.append((time.monotonic(), job))
+
+    def __next_job(self) -> Tuple[int, float, Optional[Job]]:
+        with self.condition:
+            while not self.ready:
+                if self.stopped:
+                    return 0, 0.0, None
+                self.condition.wait()
+            chat_id = self.ready.popleft()
+            submitted_at, job = self.chats[chat_id][0]
+            return chat_id, submitted_at, job
+
+    def __finish(self, chat_id: int, queue_wait: float, failed: bool) -> None:
+        with self.condition:
+            queue = self.chats[chat_id]
+            queue.popleft()
+            if queue:
+                self.ready.append(chat_id)
+            else:
+                del self.chats[chat_id]
+            self.queue_waits.append(queue_wait)
+            self.max_queue_wait = max(self.max_queue_wait, queue_wait)
+            self.handled_count += 1
+            self.failed_count += int(failed)
+            self.condition.notify_all()
+
+    def __run(self) -> None:
+        while True:
+            chat_id, submitted_at, job = self.__next_job()
+            if job is None:
+                return
+            queue_wait = time.monotonic() - submitted_at
+            failed = False
+            try:
+                job()
+            except Exception as e:
+                failed = True
+                LOGGER.error(f'Handler for chat {chat_id} failed: {e}')
+            self.__finish(chat_id, queue_wait, failed)
+
+    def pending_count(self) -> int:
+        with self.condition:
+            return self.submitted_count - self.handled_count
+
+    def drain(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.submitted_count > self.handled_count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+            return True
+
+    def stats(self) -> Dict[str, float]:
+        with self.condition:
+            waits: List[float] = sorted(self.queue_waits)
+            result = {
+                'submitted': self.submitted_count,
+                'handled': self.handled_count,
+                'failed': self.failed_count,
+                'busy_chats': len(self.chats),
+                'ready_chats': len(self.ready),
+                'queue_wait_max': self.max_queue_wait
+            }
+
+        def percentile(q: float) -> float:
+            return waits[min(len(waits) - 1, int(q * len(waits)))] if waits else 0.0
+
+        result['queue_wait_p50'] = percentile(0.5)
+        result['queue_wait_p99'] = percentile(0.99)
+        return result
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if not self.drain(timeout):
+            LOGGER.warning(f'Chat dispatcher stopped with {self.pending_count()} updates left unhandled')
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join(timeout=1.0)
+        LOGGER.info(f'Chat dispatcher stats: {self.stats()}')
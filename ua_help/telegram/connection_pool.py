@@ -0,0 +1,107 @@
+import socket
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from telegram.utils.request import Request
+from telegram.vendor.ptb_urllib3.urllib3.connection import HTTPConnection
+
+from ua_help.common.log import LOGGER
+
+SocketOption = Tuple[int, int, int]
+
+
+def keep_alive_socket_options(keep_alive_idle: Optional[int]) -> List[SocketOption]:
+    options = list(HTTPConnection.default_socket_options)
+    if keep_alive_idle is None:
+        return options
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    if 'linux' in sys.platform:
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, keep_alive_idle))
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, keep_alive_idle // 4)))
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 8))
+    return options
+
+
+class PooledRequest(Request):
+    __slots__ = ('stats_lock', 'requests_count', 'failed_count', 'total_seconds')
+
+    def __init__(
+            self,
+            size: int,
+            connect_timeout: float = 5.0,
+            read_timeout: float = 5.0,
+            keep_alive_idle: Optional[int] = 120,
+            block: bool = True,
+            proxy_url: Optional[str] = None
+    ):
+        super().__init__(
+            con_pool_size=size,
+            proxy_url=proxy_url,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout
+        )
+        pool_kwargs = getattr(self._con_pool, 'connection_pool_kw', None)
+        if pool_kwargs is not None:
+            pool_kwargs['block'] = block
+            pool_kwargs['socket_options'] = keep_alive_socket_options(keep_alive_idle)
+        self.stats_lock = threading.Lock()
+        self.requests_count = 0
+        self.failed_count = 0
+        self.total_seconds = 0.0
+
+    def _request_wrapper(self, *args: object, **kwargs: Any) -> bytes:
+        started = time.monotonic()
+        failed = True
+        try:
+            result = super()._request_wrapper(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            with self.stats_lock:
+                self.requests_count += 1
+                self.failed_count += int(failed)
+                self.total_seconds += time.monotonic() - started
+
+    def __opened_connections(self) -> int:
+        pools = getattr(self._con_pool, 'pools', None)
+        if pools is None:
+            return 0
+        return sum(map(
+            lambda key: getattr(pools.get(key), 'num_connections', 0),
+            pools.keys()
+        ))
+
+    def stats(self) -> Dict[str, float]:
+        with self.stats_lock:
+            requests_count, failed_count, total_seconds = self.requests_count, self.failed_count, self.total_seconds
+        opened = self.__opened_connections()
+        return {
+            'pool_size': self.con_pool_size,
+            'requests': requests_count,
+            'failed': failed_count,
+            'connections_opened': opened,
+            'reuse_ratio': 0.0 if requests_count == 0 else max(0.0, 1.0 - opened / requests_count),
+            'average_seconds': 0.0 if requests_count == 0 else total_seconds / requests_count
+        }
+
+
+SHARED_REQUESTS: Dict[Tuple, PooledRequest] = {}
+SHARED_REQUESTS_LOCK = threading.Lock()
+
+
+def shared_request(
+        size: int,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 5.0,
+        keep_alive_idle: Optional[int] = 120,
+        block: bool = True,
+        proxy_url: Optional[str] = None
+) -> PooledRequest:
+    key = (size, connect_timeout, read_timeout, keep_alive_idle, block, proxy_url)
+    with SHARED_REQUESTS_LOCK:
+        if key not in SHARED_REQUESTS:
+            LOGGER.info(f'Create Telegram connection pool of size {size}')
+            SHARED_REQUESTS[key] = PooledRequest(size, connect_timeout, read_timeout, keep_alive_idle, block, proxy_url)
+        return SHARED_REQUESTS[key]
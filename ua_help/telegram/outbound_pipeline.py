@@ -0,0 +1,409 @@
+import asyncio
+import dataclasses
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from telegram import Bot, ReplyMarkup
+from telegram.error import BadRequest, ChatMigrated, Unauthorized
+from telegram.ext import CallbackContext
+
+from ua_help.common.log import LOGGER
+
+PIPELINE_BOT_KEY = 'outbound_pipeline_bot'
+LATENCY_WINDOW = 1000
+
+AsyncApiCall = Callable[[int, str, Dict[str, Any]], Awaitable[Any]]
+
+
+@dataclasses.dataclass
+class OutboundOperation:
+    id: int
+    chat_id: int
+    method: str
+    kwargs: Dict[str, Any]
+    enqueued_at: float
+    attempts: int = 0
+    next_attempt_at: float = 0.0
+
+
+class QueuedMessage:
+    def __init__(self, operation_id: int, chat_id: int):
+        self.message_id = -operation_id
+        self.chat_id = chat_id
+
+
+class OutboundStore:
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS operations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                method TEXT NOT NULL,
+                kwargs TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS message_refs (
+                operation_id INTEGER PRIMARY KEY,
+                message_id INTEGER NOT NULL,
+                delivered_at REAL NOT NULL
+            )
+        ''')
+
+    def put(self, chat_id: int, method: str, kwargs: Dict[str, Any], enqueued_at: float) -> int:
+        with self.lock:
+            cursor = self.connection.execute(
+                'INSERT INTO operations (chat_id, method, kwargs, enqueued_at) VALUES (?, ?, ?, ?)',
+                (chat_id, method, json.dumps(kwargs, ensure_ascii=False), enqueued_at)
+            )
+            return cursor.lastrowid
+
+    def pending(self) -> List[OutboundOperation]:
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT id, chat_id, method, kwargs, enqueued_at, attempts FROM operations ORDER BY id'
+            ).fetchall()
+        return list(map(
+            lambda row: OutboundOperation(row[0], row[1], row[2], json.loads(row[3]), row[4], row[5]),
+            rows
+        ))
+
+    def record_attempt(self, operation_id: int, attempts: int) -> None:
+        with self.lock:
+            self.connection.execute('UPDATE operations SET attempts = ? WHERE id = ?', (attempts, operation_id))
+
+    def complete(self, operation_id: int, message_id: Optional[int]) -> None:
+        with self.lock:
+            self.connection.execute('BEGIN')
+            self.connection.execute('DELETE FROM operations WHERE id = ?', (operation_id,))
+            if message_id is not None:
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO message_refs (operation_id, message_id, delivered_at) VALUES (?, ?, ?)',
+                    (operation_id, message_id, time.time())
+                )
+            self.connection.execute('COMMIT')
+
+    def resolve(self, operation_id: int) -> Optional[int]:
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT message_id FROM message_refs WHERE operation_id = ?',
+                (operation_id,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def forget_refs(self, older_than: float) -> None:
+        with self.lock:
+            self.connection.execute('DELETE FROM message_refs WHERE delivered_at < ?', (older_than,))
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+class SenderPartition:
+    def __init__(self):
+        self.chats: Dict[int, Deque[OutboundOperation]] = {}
+        self.condition = threading.Condition()
+        self.waker: Optional[Callable[[], None]] = None
+
+    def put(self, operation: OutboundOperation) -> None:
+        with self.condition:
+            self.chats.setdefault(operation.chat_id, deque()).append(operation)
+            self.condition.notify()
+            if self.waker is not None:
+                self.waker()
+
+    def size(self) -> int:
+        with self.condition:
+            return sum(map(len, self.chats.values()))
+
+    def operation_ids(self) -> Set[int]:
+        with self.condition:
+            return set(operation.id for queue in self.chats.values() for operation in queue)
+
+
+class OutboundPipeline:
+    def __init__(
+            self,
+            bot: Bot,
+            path: Path,
+            workers: int = 4,
+            base_backoff: float = 1.0,
+            max_backoff: float = 60.0,
+            max_attempts: int = 8,
+            refs_ttl: float = 2 * 24 * 60 * 60
+    ):
+        self.bot = bot
+        self.store = OutboundStore(path)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.refs_ttl = refs_ttl
+        self.partitions = list(map(lambda _: SenderPartition(), range(workers)))
+        self.workers = list(map(
+            lambda i: threading.Thread(target=self.__run, args=(self.partitions[i],), name=f'tg-send-{i}', daemon=True),
+            range(workers)
+        ))
+        self.stopped = threading.Event()
+        self.async_tasks: List[asyncio.Future] = []
+        self.stats_lock = threading.Lock()
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.delivered_count = 0
+        self.failed_count = 0
+        self.retried_count = 0
+
+    def __partition(self, chat_id: int) -> SenderPartition:
+        return self.partitions[chat_id % len(self.partitions)]
+
+    def __replay(self) -> None:
+        self.store.forget_refs(time.time() - self.refs_ttl)
+        queued = set().union(*map(lambda partition: partition.operation_ids(), self.partitions))
+        pending = list(filter(lambda operation: operation.id not in queued, self.store.pending()))
+        if pending:
+            LOGGER.info(f'Replay {len(pending)} outbound Telegram operations')
+        for operation in pending:
+            self.__partition(operation.chat_id).put(operation)
+
+    def start(self) -> 'OutboundPipeline':
+        self.__replay()
+        for worker in self.workers:
+            worker.start()
+        return self
+
+    def start_async(self, loop: asyncio.AbstractEventLoop, call: AsyncApiCall) -> 'OutboundPipeline':
+        self.__replay()
+        for partition in self.partitions:
+            self.async_tasks.append(asyncio.run_coroutine_threadsafe(self.__run_async(loop, partition, call), loop))
+        return self
+
+    def enqueue(self, chat_id: int, method: str, kwargs: Dict[str, Any]) -> int:
+        stored_kwargs = dict(kwargs)
+        if isinstance(stored_kwargs.get('reply_markup'), ReplyMarkup):
+            stored_kwargs['reply_markup'] = stored_kwargs['reply_markup'].to_json()
+        enqueued_at = time.time()
+        operation_id = self.store.put(chat_id, method, stored_kwargs, enqueued_at)
+        self.__partition(chat_id).put(OutboundOperation(operation_id, chat_id, method, stored_kwargs, enqueued_at))
+        return operation_id
+
+    def pending_count(self) -> int:
+        return sum(map(lambda partition: partition.size(), self.partitions))
+
+    def stats(self) -> Dict[str, float]:
+        with self.stats_lock:
+            latencies = sorted(self.latencies)
+            delivered, failed, retried = self.delivered_count, self.failed_count, self.retried_count
+
+        def percentile(q: float) -> float:
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+
+        return {
+            'pending': self.pending_count(),
+            'delivered': delivered,
+            'failed': failed,
+            'retried': retried,
+            'latency_p50': percentile(0.5),
+            'latency_p99': percentile(0.99)
+        }
+
+    def drain(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while self.pending_count() > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.pending_count() == 0
+
+    def stop(self, timeout: float = 10.0) -> None:
+        drained = self.drain(timeout)
+        self.stopped.set()
+        for partition in self.partitions:
+            with partition.condition:
+                partition.condition.notify_all()
+                if partition.waker is not None:
+                    partition.waker()
+        for worker in self.workers:
+            if worker.is_alive():
+                worker.join(timeout=1.0)
+        for task in self.async_tasks:
+            try:
+                task.result(timeout=1.0)
+            except Exception as e:
+                LOGGER.warning(f'Outbound sender task did not stop cleanly: {e}')
+        if not drained:
+            LOGGER.warning(f'Outbound pipeline stopped with {self.pending_count()} operations left for the next start')
+        LOGGER.info(f'Outbound pipeline stats: {self.stats()}')
+        self.store.close()
+
+    def __ready_operations(
+            self,
+            partition: SenderPartition,
+            busy_chats: Set[int]
+    ) -> Tuple[List[OutboundOperation], Optional[float]]:
+        now = time.time()
+        heads = list(map(
+            lambda queue: queue[0],
+            filter(lambda queue: queue[0].chat_id not in busy_chats, partition.chats.values())
+        ))
+        ready = list(filter(lambda operation: operation.next_attempt_at <= now, heads))
+        if ready:
+            return ready, None
+        next_attempt = min(map(lambda operation: operation.next_attempt_at, heads), default=None)
+        return [], None if next_attempt is None else next_attempt - now
+
+    def __next_operation(self, partition: SenderPartition) -> Optional[OutboundOperation]:
+        with partition.condition:
+            while not self.stopped.is_set():
+                ready, wait_for = self.__ready_operations(partition, set())
+                if ready:
+                    return ready[0]
+                partition.condition.wait(wait_for)
+            return None
+
+    def __finish(self, partition: SenderPartition, operation: OutboundOperation) -> None:
+        with partition.condition:
+            queue = partition.chats.pop(operation.chat_id)
+            queue.popleft()
+            if queue:
+                partition.chats[operation.chat_id] = queue
+
+    def __resolve_kwargs(self, operation: OutboundOperation) -> Dict[str, Any]:
+        kwargs = dict(operation.kwargs)
+        message_id = kwargs.get('message_id')
+        if message_id is not None and message_id < 0:
+            kwargs['message_id'] = self.store.resolve(-message_id)
+            if kwargs['message_id'] is None:
+                raise BadRequest(f'Message of operation {-message_id} was never delivered')
+        return kwargs
+
+    def __execute(self, operation: OutboundOperation) -> Optional[int]:
+        kwargs = self.__resolve_kwargs(operation)
+        try:
+            result = getattr(self.bot, operation.method)(**kwargs)
+        except BadRequest as e:
+            if 'message is not modified' in e.message.lower():
+                return None
+            raise
+        return getattr(result, 'message_id', None)
+
+    async def __execute_async(self, operation: OutboundOperation, call: AsyncApiCall) -> Optional[int]:
+        kwargs = self.__resolve_kwargs(operation)
+        try:
+            result = await call(operation.chat_id, operation.method, kwargs)
+        except BadRequest as e:
+            if 'message is not modified' in e.message.lower():
+                return None
+            raise
+        return result.get('message_id') if isinstance(result, dict) else None
+
+    def __delivered(self, partition: SenderPartition, operation: OutboundOperation, message_id: Optional[int]) -> None:
+        self.store.complete(operation.id, message_id)
+        self.__finish(partition, operation)
+        with self.stats_lock:
+            self.delivered_count += 1
+            self.latencies.append(time.time() - operation.enqueued_at)
+
+    def __failed(self, partition: SenderPartition, operation: OutboundOperation, e: Exception) -> None:
+        if not isinstance(e, (BadRequest, Unauthorized, ChatMigrated)):
+            operation.attempts += 1
+            self.store.record_attempt(operation.id, operation.attempts)
+            if operation.attempts < self.max_attempts:
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** (operation.attempts - 1))
+                LOGGER.warning(f'Outbound {operation.method} to chat {operation.chat_id} failed, retry in {backoff}s: {e}')
+                with partition.condition:
+                    operation.next_attempt_at = time.time() + backoff
+                with self.stats_lock:
+                    self.retried_count += 1
+                return
+        LOGGER.error(f'Drop outbound {operation.method} to chat {operation.chat_id}: {e}')
+        self.store.complete(operation.id, None)
+        self.__finish(partition, operation)
+        with self.stats_lock:
+            self.failed_count += 1
+
+    def __run(self, partition: SenderPartition) -> None:
+        while True:
+            operation = self.__next_operation(partition)
+            if operation is None:
+                return
+            try:
+                message_id = self.__execute(operation)
+            except Exception as e:
+                self.__failed(partition, operation, e)
+                continue
+            self.__delivered(partition, operation, message_id)
+
+    async def __deliver_async(
+            self,
+            partition: SenderPartition,
+            operation: OutboundOperation,
+            call: AsyncApiCall,
+            in_flight: Dict[int, asyncio.Task],
+            wake: asyncio.Event
+    ) -> None:
+        try:
+            message_id = await self.__execute_async(operation, call)
+        except Exception as e:
+            self.__failed(partition, operation, e)
+        else:
+            self.__delivered(partition, operation, message_id)
+        finally:
+            del in_flight[operation.chat_id]
+            wake.set()
+
+    async def __run_async(self, loop: asyncio.AbstractEventLoop, partition: SenderPartition, call: AsyncApiCall) -> None:
+        wake = asyncio.Event()
+        in_flight: Dict[int, asyncio.Task] = {}
+        with partition.condition:
+            partition.waker = lambda: loop.call_soon_threadsafe(wake.set)
+        while not self.stopped.is_set():
+            wake.clear()
+            with partition.condition:
+                ready, wait_for = self.__ready_operations(partition, set(in_flight))
+            for operation in ready:
+                in_flight[operation.chat_id] = loop.create_task(
+                    self.__deliver_async(partition, operation, call, in_flight, wake)
+                )
+            if ready:
+                continue
+            try:
+                await asyncio.wait_for(wake.wait(), wait_for)
+            except asyncio.TimeoutError:
+                pass
+        if in_flight:
+            await asyncio.gather(*in_flight.values(), return_exceptions=True)
+
+
+class PipelineBot:
+    def __init__(self, pipeline: OutboundPipeline):
+        self.pipeline = pipeline
+
+    def send_message(self, **kwargs) -> QueuedMessage:
+        chat_id = kwargs['chat_id']
+        return QueuedMessage(self.pipeline.enqueue(chat_id, 'send_message', kwargs), chat_id)
+
+    def edit_message_text(self, **kwargs) -> bool:
+        self.pipeline.enqueue(kwargs['chat_id'], 'edit_message_text', kwargs)
+        return True
+
+    def edit_message_reply_markup(self, **kwargs) -> bool:
+        self.pipeline.enqueue(kwargs['chat_id'], 'edit_message_reply_markup', kwargs)
+        return True
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.pipeline.bot, name)
+
+
+class PipelineContext(CallbackContext):
+    @property
+    def bot(self) -> Bot:
+        return self.bot_data.get(PIPELINE_BOT_KEY, self.dispatcher.bot)
@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import logging
+import math
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from ua_help.telegram.async_runtime import AsyncRuntime
+from ua_help.telegram.chat_dispatcher import ChatDispatcher
+from ua_help.telegram.outbound_pipeline import OutboundPipeline, PipelineBot
+
+Update = Tuple[int, int]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(math.ceil(q * len(ordered)) - 1, 0))]
+
+
+class DeliveryRecorder:
+    def __init__(self):
+        self.submitted_at: Dict[Update, float] = {}
+        self.delivered_at: Dict[Update, float] = {}
+        self.delivered_order: Dict[int, List[int]] = {}
+        self.lock = threading.Lock()
+
+    def submitted(self, update: Update) -> None:
+        with self.lock:
+            self.submitted_at[update] = time.monotonic()
+
+    def delivered(self, chat_id: int, text: str) -> int:
+        update = (chat_id, int(text))
+        with self.lock:
+            self.delivered_at[update] = time.monotonic()
+            self.delivered_order.setdefault(chat_id, []).append(update[1])
+            return len(self.delivered_at)
+
+    def out_of_order(self) -> int:
+        return sum(map(
+            lambda order: sum(map(lambda pair: pair[0] > pair[1], zip(order, order[1:]))),
+            self.delivered_order.values()
+        ))
+
+    def end_to_end(self) -> List[float]:
+        return list(map(
+            lambda delivered: delivered[1] - self.submitted_at[delivered[0]],
+            self.delivered_at.items()
+        ))
+
+
+class LatencyBot:
+    def __init__(self, recorder: DeliveryRecorder, latency: float):
+        self.recorder = recorder
+        self.latency = latency
+
+    def send_message(self, chat_id: int, text: str, **kwargs) -> Any:
+        time.sleep(self.latency)
+        return type('Message', (), {'message_id': self.recorder.delivered(chat_id, text)})()
+
+
+def make_updates(chats: int, updates_per_chat: int) -> List[Update]:
+    return [(chat_id, seq) for seq in range(updates_per_chat) for chat_id in range(1, chats + 1)]
+
+
+def make_handler(bot: PipelineBot, handler_io: float):
+    def handle(update: Update) -> None:
+        if handler_io > 0:
+            time.sleep(handler_io)
+        bot.send_message(chat_id=update[0], text=str(update[1]))
+
+    return handle
+
+
+def benchmark(mode: str, args: argparse.Namespace, folder: Path) -> Dict[str, float]:
+    recorder = DeliveryRecorder()
+    pipeline = OutboundPipeline(
+        LatencyBot(recorder, args.latency),
+        folder / f'{mode}.sqlite3',
+        workers=args.workers,
+        base_backoff=0.1
+    )
+    handle = make_handler(PipelineBot(pipeline), args.handler_io)
+    updates = make_updates(args.chats, args.updates_per_chat)
+    runtime = None
+    dispatcher = None
+    started = time.monotonic()
+    for update in updates:
+        recorder.submitted(update)
+
+    if mode == 'threaded':
+        pipeline.start()
+        for update in updates:
+            handle(update)
+    elif mode == 'pooled':
+        dispatcher = ChatDispatcher(workers=args.executor_workers).start()
+        pipeline.start()
+        for update in updates:
+            dispatcher.submit(update[0], lambda update=update: handle(update))
+        dispatcher.drain(args.drain_timeout)
+    else:
+        runtime = AsyncRuntime(executor_workers=args.executor_workers).start()
+
+        async def call(chat_id: int, method: str, kwargs: Dict[str, Any]) -> Dict[str, int]:
+            await asyncio.sleep(args.latency)
+            return {'message_id': recorder.delivered(chat_id, kwargs['text'])}
+
+        pipeline.start_async(runtime.loop, call)
+        for update in updates:
+            runtime.submit(update[0], lambda update=update: handle(update))
+        runtime.drain(args.drain_timeout)
+    pipeline.drain(args.drain_timeout)
+    elapsed = time.monotonic() - started
+    threads = threading.active_count()
+    pipeline.stop(timeout=args.drain_timeout)
+    if dispatcher is not None:
+        dispatcher.stop()
+    if runtime is not None:
+        runtime.stop()
+
+    end_to_end = recorder.end_to_end()
+    return {
+        'updates_per_second': len(end_to_end) / elapsed,
+        'delivered': len(end_to_end),
+        'out_of_order': recorder.out_of_order(),
+        'end_to_end_p50_ms': percentile(end_to_end, 0.5) * 1000,
+        'end_to_end_p99_ms': percentile(end_to_end, 0.99) * 1000,
+        'threads': threads
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Compare the bot runtimes on emulated Telegram')
+    arg_parser.add_argument('--mode', choices=['threaded', 'pooled', 'asyncio', 'all'], default='all')
+    arg_parser.add_argument('--chats', type=int, default=200)
+    arg_parser.add_argument('--updates-per-chat', type=int, default=3)
+    arg_parser.add_argument('--latency', type=float, default=0.05, help='Emulated Telegram API latency, seconds')
+    arg_parser.add_argument('--handler-io', type=float, default=0.0, help='Blocking work per update, seconds')
+    arg_parser.add_argument('--workers', type=int, default=4, help='Outbound workers of the threaded and pooled runtimes')
+    arg_parser.add_argument('--executor-workers', type=int, default=8, help='Handler threads of the pooled and asyncio runtimes')
+    arg_parser.add_argument('--drain-timeout', type=float, default=300.0)
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.WARNING)
+
+    modes = ['threaded', 'pooled', 'asyncio'] if args.mode == 'all' else [args.mode]
+    with tempfile.TemporaryDirectory() as folder:
+        for mode in modes:
+            result = benchmark(mode, args, Path(folder))
+            formatted = ', '.join(map(lambda kv: f'{kv[0]}={kv[1]:.1f}', result.items()))
+            print(f'{mode}: {formatted}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+import asyncio
+import enum
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from telegram.error import RetryAfter
+from telegram.ext import ExtBot
+
+from ua_help.common.log import LOGGER
+
+T = TypeVar('T')
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def seconds_until(self, now: float, amount: float = 1.0, reserve: float = 0.0) -> float:
+        self.refill(now)
+        missing = amount + reserve - self.tokens
+        wait_for_tokens = 0.0 if missing <= 0 else missing / self.rate
+        return max(wait_for_tokens, self.paused_until - now)
+
+    def take(self, amount: float = 1.0) -> None:
+        self.tokens -= amount
+
+    def pause(self, now: float, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, now + seconds)
+
+    def is_idle(self, now: float) -> bool:
+        self.refill(now)
+        return self.tokens >= self.capacity and self.paused_until <= now
+
+
+class SendPriority(enum.Enum):
+    INTERACTIVE = 0
+    BULK = 1
+
+
+class SendScheduler:
+    def __init__(
+            self,
+            global_rate: float = 30.0,
+            global_burst: float = 30.0,
+            per_chat_rate: float = 1.0,
+            per_chat_burst: float = 3.0,
+            bulk_reserve: float = 10.0,
+            max_retries: int = 3
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.bulk_reserve = bulk_reserve
+        self.max_retries = max_retries
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        self.condition = threading.Condition()
+
+    def __chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        if chat_id not in self.chat_buckets:
+            if len(self.chat_buckets) > 10000:
+                self.chat_buckets = dict(filter(lambda kv: not kv[1].is_idle(now), self.chat_buckets.items()))
+            self.chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        return self.chat_buckets[chat_id]
+
+    def __try_acquire(self, chat_id: Optional[int], priority: SendPriority) -> float:
+        reserve = self.bulk_reserve if priority == SendPriority.BULK else 0.0
+        now = time.monotonic()
+        chat_bucket = None if chat_id is None else self.__chat_bucket(chat_id, now)
+        wait_for = max(
+            self.global_bucket.seconds_until(now, reserve=reserve),
+            0.0 if chat_bucket is None else chat_bucket.seconds_until(now)
+        )
+        if wait_for <= 0:
+            self.global_bucket.take()
+            if chat_bucket is not None:
+                chat_bucket.take()
+        return wait_for
+
+    def acquire(self, chat_id: Optional[int], priority: SendPriority) -> None:
+        with self.condition:
+            while True:
+                wait_for = self.__try_acquire(chat_id, priority)
+                if wait_for <= 0:
+                    return
+                self.condition.wait(wait_for)
+
+    async def acquire_async(self, chat_id: Optional[int], priority: SendPriority) -> None:
+        while True:
+            with self.condition:
+                wait_for = self.__try_acquire(chat_id, priority)
+            if wait_for <= 0:
+                return
+            await asyncio.sleep(wait_for)
+
+    def pause(self, chat_id: Optional[int], seconds: float) -> None:
+        with self.condition:
+            now = time.monotonic()
+            if chat_id is None:
+                self.global_bucket.pause(now, seconds)
+            else:
+                self.__chat_bucket(chat_id, now).pause(now, seconds)
+            self.condition.notify_all()
+
+    def run(self, chat_id: Optional[int], priority: SendPriority, call: Callable[[], T]) -> T:
+        attempt = 0
+        while True:
+            self.acquire(chat_id, priority)
+            try:
+                return call()
+            except RetryAfter as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                LOGGER.warning(f'Telegram flood control for chat {chat_id}, retry after {e.retry_after}s')
+                self.pause(chat_id, float(e.retry_after))
+
+    async def run_async(self, chat_id: Optional[int], priority: SendPriority, call: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            await self.acquire_async(chat_id, priority)
+            try:
+                return await call()
+            except RetryAfter as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                LOGGER.warning(f'Telegram flood control for chat {chat_id}, retry after {e.retry_after}s')
+                self.pause(chat_id, float(e.retry_after))
+
+
+class ThrottledBot(ExtBot):
+    def __init__(
+            self,
+            token: str,
+            scheduler: SendScheduler,
+            priority: SendPriority = SendPriority.INTERACTIVE,
+            **kwargs
+    ):
+        super().__init__(token, **kwargs)
+        self.scheduler = scheduler
+        self.priority = priority
+        self.bot_kwargs = kwargs
+
+    def with_priority(self, priority: SendPriority) -> 'ThrottledBot':
+        return ThrottledBot(
+            self.token,
+            self.scheduler,
+            priority,
+            **dict(self.bot_kwargs, request=self.request)
+        )
+
+    def __throttled(self, chat_id: Optional[int], call: Callable[[], T]) -> T:
+        return self.scheduler.run(chat_id, self.priority, call)
+
+    def send_message(self, *args, **kwargs):
+        chat_id = kwargs.get('chat_id', args[0] if args else None)
+        return self.__throttled(chat_id, lambda: super(ThrottledBot, self).send_message(*args, **kwargs))
+
+    def edit_message_text(self, *args, **kwargs):
+        chat_id = kwargs.get('chat_id', args[1] if len(args) > 1 else None)
+        return self.__throttled(chat_id, lambda: super(ThrottledBot, self).edit_message_text(*args, **kwargs))
+
+    def edit_message_reply_markup(self, *args, **kwargs):
+        chat_id = kwargs.get('chat_id', args[0] if args else None)
+        return self.__throttled(chat_id, lambda: super(ThrottledBot, self).edit_message_reply_markup(*args, **kwargs))
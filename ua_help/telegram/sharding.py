@@ -0,0 +1,253 @@
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from telegram import Update
+
+from ua_help.common.log import LOGGER
+
+RING_REPLICAS = 128
+
+
+def stable_hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    def __init__(self, shards: int, replicas: int = RING_REPLICAS):
+        self.shards = shards
+        points = sorted(
+            (stable_hash(f'shard-{shard}-{replica}'), shard)
+            for shard in range(shards)
+            for replica in range(replicas)
+        )
+        self.hashes = list(map(lambda point: point[0], points))
+        self.owners = list(map(lambda point: point[1], points))
+
+    def shard_for(self, chat_id: int) -> int:
+        position = bisect.bisect(self.hashes, stable_hash(str(chat_id))) % len(self.hashes)
+        return self.owners[position]
+
+
+def update_chat_id(update: Update) -> int:
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return 0
+
+
+def run_shard_worker(
+        make_bot: Callable[..., Tuple[Any, Callable[[], None]]],
+        make_bot_args: Tuple[Any, ...],
+        shard: int,
+        shards: int,
+        inbox: multiprocessing.Queue,
+        acks: multiprocessing.Queue,
+        forwards: multiprocessing.Queue,
+        log_kwargs: Dict[str, Any]
+) -> None:
+    if 'filename' in log_kwargs:
+        log_kwargs = dict(log_kwargs, filename=f'{log_kwargs["filename"]}.shard-{shard}')
+    logging.basicConfig(
+        format=f'%(asctime)s - shard {shard} - %(name)s - %(levelname)s - %(message)s',
+        force=True,
+        **log_kwargs
+    )
+    bot, close = make_bot(*make_bot_args, shard)
+    try:
+        bot.serve_shard(shard, HashRing(shards), inbox, acks, forwards)
+    finally:
+        close()
+
+
+class ShardedFront:
+    def __init__(
+            self,
+            make_bot: Callable[..., Tuple[Any, Callable[[], None]]],
+            make_bot_args: Tuple[Any, ...],
+            workers: int,
+            log_kwargs: Optional[Dict[str, Any]] = None,
+            rebalance_timeout: float = 60.0
+    ):
+        self.context = multiprocessing.get_context('forkserver')
+        self.context.set_forkserver_preload([make_bot.__module__])
+        self.make_bot = make_bot
+        self.make_bot_args = make_bot_args
+        self.log_kwargs = log_kwargs if log_kwargs is not None else {}
+        self.rebalance_timeout = rebalance_timeout
+        self.ring = HashRing(workers)
+        self.inboxes: List[multiprocessing.Queue] = []
+        self.processes: List[multiprocessing.Process] = []
+        self.acks = self.context.Queue()
+        self.forwards = self.context.Queue()
+        self.forwarder = threading.Thread(target=self.__forward, name='tg-shard-forward', daemon=True)
+        self.lock = threading.Lock()
+        self.routed_counts: List[int] = []
+        self.forwarded_count = 0
+
+    def __start_worker(
+            self,
+            shard: int,
+            shards: int,
+            inbox: Optional[multiprocessing.Queue] = None
+    ) -> Tuple[multiprocessing.Queue, multiprocessing.Process]:
+        inbox = self.context.Queue() if inbox is None else inbox
+        process = self.context.Process(
+            target=run_shard_worker,
+            args=(
+                self.make_bot,
+                self.make_bot_args,
+                shard,
+                shards,
+                inbox,
+                self.acks,
+                self.forwards,
+                self.log_kwargs
+            ),
+            name=f'tg-shard-{shard}',
+            daemon=False
+        )
+        process.start()
+        return inbox, process
+
+    def __add_worker(self, shard: int, shards: int) -> None:
+        inbox, process = self.__start_worker(shard, shards)
+        self.inboxes.append(inbox)
+        self.processes.append(process)
+        self.routed_counts.append(0)
+
+    def __wait_acks(self, shards: Set[int], kind: str) -> Set[int]:
+        confirmed: Set[int] = set()
+        deadline = time.monotonic() + self.rebalance_timeout
+        while confirmed != shards:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                shard, ack = self.acks.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if ack == kind and shard in shards:
+                confirmed.add(shard)
+                LOGGER.info(f'Shard {shard} confirmed {ack}')
+            else:
+                LOGGER.warning(f'Ignore unexpected {ack} confirmation of shard {shard}')
+        if confirmed != shards:
+            LOGGER.error(f'Shards {sorted(shards - confirmed)} did not confirm {kind} in {self.rebalance_timeout}s')
+        return confirmed
+
+    def __forward(self) -> None:
+        while True:
+            message = self.forwards.get()
+            if message is None:
+                return
+            with self.lock:
+                shard = self.ring.shard_for(message[1])
+                self.inboxes[shard].put(message)
+                self.forwarded_count += 1
+
+    def start(self) -> 'ShardedFront':
+        with self.lock:
+            for shard in range(self.ring.shards):
+                self.__add_worker(shard, self.ring.shards)
+        self.forwarder.start()
+        LOGGER.info(f'Started {self.ring.shards} shard workers')
+        return self
+
+    def route(self, update: Update) -> None:
+        with self.lock:
+            shard = self.ring.shard_for(update_chat_id(update))
+            self.inboxes[shard].put(('update', update.to_dict()))
+            self.routed_counts[shard] += 1
+
+    def __restart_after_exit(self, shard: int, shards: int, process: multiprocessing.Process) -> None:
+        process.join()
+        with self.lock:
+            if shard >= len(self.processes) or self.processes[shard] is not process:
+                return
+            _, self.processes[shard] = self.__start_worker(shard, shards, self.inboxes[shard])
+        LOGGER.info(f'Shard {shard} restarted on its inbox after an aborted rebalancing')
+
+    def __grow(self, old_workers: int, workers: int) -> None:
+        survivors = set(range(old_workers))
+        for shard in survivors:
+            self.inboxes[shard].put(('rebalance', workers))
+        if self.__wait_acks(survivors, 'rebalance') != survivors:
+            LOGGER.error(f'Abort rebalancing, keep {old_workers} shard workers')
+            for shard in survivors:
+                self.inboxes[shard].put(('rebalance', old_workers))
+            self.__wait_acks(survivors, 'rebalance')
+            return
+        for shard in range(old_workers, workers):
+            self.__add_worker(shard, workers)
+        self.ring = HashRing(workers)
+
+    def __shrink(self, old_workers: int, workers: int) -> None:
+        removed = set(range(workers, old_workers))
+        for shard in removed:
+            self.inboxes[shard].put(('stop',))
+        stopped = self.__wait_acks(removed, 'stop')
+        for shard in stopped:
+            self.processes[shard].join(timeout=self.rebalance_timeout)
+        if stopped != removed:
+            LOGGER.error(f'Abort rebalancing, restart shards {sorted(removed)} and keep {old_workers} shard workers')
+            for shard in removed:
+                threading.Thread(
+                    target=self.__restart_after_exit,
+                    args=(shard, old_workers, self.processes[shard]),
+                    name=f'tg-shard-{shard}-restart',
+                    daemon=True
+                ).start()
+            return
+        del self.inboxes[workers:]
+        del self.processes[workers:]
+        del self.routed_counts[workers:]
+        self.ring = HashRing(workers)
+        survivors = set(range(workers))
+        for shard in survivors:
+            self.inboxes[shard].put(('rebalance', workers))
+        self.__wait_acks(survivors, 'rebalance')
+        for shard in removed:
+            self.inboxes[shard % workers].put(('adopt', shard))
+
+    def resize(self, workers: int) -> None:
+        with self.lock:
+            old_workers = self.ring.shards
+            if workers == old_workers or workers < 1:
+                return
+            LOGGER.info(f'Rebalance chats from {old_workers} to {workers} shard workers')
+            if workers > old_workers:
+                self.__grow(old_workers, workers)
+            else:
+                self.__shrink(old_workers, workers)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'workers': self.ring.shards,
+                'alive': sum(map(lambda process: process.is_alive(), self.processes)),
+                'routed': list(self.routed_counts),
+                'forwarded': self.forwarded_count
+            }
+
+    def stop(self) -> None:
+        with self.lock:
+            for inbox in self.inboxes:
+                inbox.put(('stop',))
+            self.__wait_acks(set(range(len(self.processes))), 'stop')
+            for process in self.processes:
+                process.join(timeout=self.rebalance_timeout)
+        self.forwards.put(None)
+        self.forwarder.join(timeout=self.rebalance_timeout)
+        LOGGER.info(f'Shard front stats: {self.stats()}')
+
+
+def shard_path(path: Path, shard: int) -> Path:
+    return path.with_name(f'{path.stem}-shard-{shard}{path.suffix}')
@@ -1,13 +1,72 @@
+import concurrent.futures
+import multiprocessing
 import os
-from typing import Callable, Dict, List
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
 
 import telegram.ext
-from telegram import Update, Chat
-from telegram.ext import Filters, MessageHandler, CallbackQueryHandler, CallbackContext
+from telegram import Update, Chat, InlineQueryResultArticle, InputTextMessageContent
+from telegram.error import TelegramError
+from telegram.ext import Filters, MessageHandler, CallbackQueryHandler, CallbackContext, ContextTypes, \
+    InlineQueryHandler, TypeHandler, Updater
 
 from ua_help.bot_students.config import StudentTelegramFormConfig
 from ua_help.common import log
 from ua_help.common.command_handler import CommandHandler
+from ua_help.telegram.admission_control import AdmissionControl
+from ua_help.telegram.async_bot_api import AsyncBotApi
+from ua_help.telegram.async_runtime import AsyncRuntime
+from ua_help.telegram.chat_dispatcher import ChatDispatcher
+from ua_help.telegram.connection_pool import shared_request
+from ua_help.telegram.outbound_pipeline import OutboundPipeline, PipelineBot, PipelineContext, PIPELINE_BOT_KEY
+from ua_help.telegram.send_scheduler import SendScheduler, ThrottledBot, SendPriority
+from ua_help.telegram.sharding import HashRing, ShardedFront, update_chat_id
+from ua_help.telegram.update_dedup import UpdateDeduplicator, dedup_handler
+from ua_help.telegram.webhook_ingress import WebhookIngress
+
+MAX_PENDING_SHED_ANSWERS = 100
+
+
+def serve_updates(updater: Updater, config: StudentTelegramFormConfig) -> None:
+    if config.use_webhook:
+        webhook_url = f'{config.host_url}/{config.telegram_bot_token}'
+        ingress = WebhookIngress(
+            updater.dispatcher,
+            config.telegram_bot_token,
+            listen=config.webhook_listen,
+            port=config.webhook_port,
+            max_queue=config.webhook_queue_size,
+            stats_interval=config.webhook_stats_interval
+        ).start()
+        log.LOGGER.info(f'Run bot with webhook: {webhook_url}')
+        updater.bot.set_webhook(url=webhook_url)
+        ingress.idle()
+        ingress.stop()
+    else:
+        log.LOGGER.info(f'Run bot with long pooling')
+        updater.start_polling()
+        updater.idle()
+
+
+def run_sharded(front: ShardedFront, config: StudentTelegramFormConfig) -> None:
+    updater = Updater(
+        bot=telegram.ext.ExtBot(config.telegram_bot_token, request=shared_request(
+            config.telegram_pool_size,
+            connect_timeout=config.telegram_connect_timeout,
+            read_timeout=config.telegram_read_timeout,
+            keep_alive_idle=config.telegram_keep_alive_idle,
+            block=config.telegram_pool_block
+        )),
+        use_context=True
+    )
+    deduplicator = UpdateDeduplicator(config.update_dedup_state, window=config.update_dedup_window)
+    updater.dispatcher.add_handler(dedup_handler(deduplicator), group=-1)
+    updater.dispatcher.add_handler(TypeHandler(Update, lambda update, context: front.route(update)))
+    front.start()
+    serve_updates(updater, config)
+    front.stop()
+    log.LOGGER.info(f'Update deduplication stats: {deduplicator.stats()}')
 
 
 class TelegramBot:
@@ -15,59 +74,298 @@ class TelegramBot:
             self,
             command_handler_producer: Callable[[Chat], CommandHandler],
             all_commands: List[str],
-            config: StudentTelegramFormConfig
+            config: StudentTelegramFormConfig,
+            readiness_checks: Optional[Dict[str, Callable[[], bool]]] = None,
+            collapsible_callback: Optional[Callable[[str], bool]] = None,
+            shard_adopter: Optional[Callable[[int], None]] = None
     ):
         self.command_handler_producer = command_handler_producer
-        self.all_chats: Dict[Chat, CommandHandler] = {}
-        self.updater = telegram.ext.Updater(config.telegram_bot_token, use_context=True)
+        self.shard_adopter = shard_adopter
+        self.adopted_outbound: List[OutboundPipeline] = []
+        self.readiness_checks = readiness_checks if readiness_checks is not None else {}
+        self.all_chats: Dict[int, CommandHandler] = {}
+        self.all_chats_lock = threading.Lock()
+        self.send_scheduler = SendScheduler(
+            global_rate=config.send_global_rate,
+            global_burst=config.send_global_rate,
+            per_chat_rate=config.send_per_chat_rate,
+            per_chat_burst=config.send_per_chat_burst,
+            bulk_reserve=config.send_bulk_reserve
+        )
+        self.bot = ThrottledBot(
+            config.telegram_bot_token,
+            self.send_scheduler,
+            request=shared_request(
+                config.telegram_pool_size,
+                connect_timeout=config.telegram_connect_timeout,
+                read_timeout=config.telegram_read_timeout,
+                keep_alive_idle=config.telegram_keep_alive_idle,
+                block=config.telegram_pool_block
+            )
+        )
+        self.bulk_bot = self.bot.with_priority(SendPriority.BULK)
+        self.outbound = OutboundPipeline(self.bot, config.outbound_db, workers=config.outbound_workers)
+        self.updater = telegram.ext.Updater(
+            bot=self.bot,
+            use_context=True,
+            context_types=ContextTypes(context=PipelineContext)
+        )
         self.dispatcher = self.updater.dispatcher
+        self.dispatcher.bot_data[PIPELINE_BOT_KEY] = PipelineBot(self.outbound)
         self.config = config
-
-        def get_chat_handler(chat: Chat) -> CommandHandler:
-            if chat.id not in self.all_chats:
-                self.all_chats[chat.id] = self.command_handler_producer(chat)
-            return self.all_chats[chat.id]
+        self.deduplicator = UpdateDeduplicator(config.update_dedup_state, window=config.update_dedup_window)
+        self.dispatcher.add_handler(dedup_handler(self.deduplicator), group=-1)
+        self.admission = AdmissionControl(
+            per_chat_rate=config.inbound_per_chat_rate,
+            per_chat_burst=config.inbound_per_chat_burst,
+            max_in_flight=config.inbound_max_in_flight,
+            is_collapsible=collapsible_callback
+        )
+        self.shed_answers = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='tg-shed-answer')
+        self.shed_answers_pending = 0
+        self.shed_answers_lock = threading.Lock()
+        self.runtime: Optional[AsyncRuntime] = None
+        self.async_api: Optional[AsyncBotApi] = None
+        self.chat_dispatcher: Optional[ChatDispatcher] = None
+        self.shard: Optional[int] = None
+        self.shard_ring: Optional[HashRing] = None
+        self.shard_forwards: Optional[multiprocessing.Queue] = None
+        if config.runtime == 'pooled':
+            self.chat_dispatcher = ChatDispatcher(workers=config.dispatch_workers)
+        elif config.runtime == 'asyncio':
+            self.runtime = AsyncRuntime(
+                executor_workers=config.async_executor_workers,
+                io_workers=config.async_io_workers
+            )
+            self.async_api = AsyncBotApi(
+                config.telegram_bot_token,
+                connect_timeout=config.telegram_connect_timeout,
+                request_timeout=config.telegram_read_timeout
+            )
 
         def command_wrapper(command: str):
             def handle(update: Update, context: CallbackContext):
-                chat_handler = get_chat_handler(update.effective_chat)
+                chat_handler = self.get_chat_handler(update.effective_chat)
                 chat_handler.handle_command(command, (update, context))
 
             return handle
 
         def user_message_handler(update: Update, context: CallbackContext):
-            chat_handler = get_chat_handler(update.effective_chat)
+            chat_handler = self.get_chat_handler(update.effective_chat)
             chat_handler.handle_input(update.message.text, (update, context))
 
         def query_handler(update: Update, context: CallbackContext):
-            chat_handler = get_chat_handler(update.effective_chat)
+            chat_handler = self.get_chat_handler(update.effective_chat)
             chat_handler.handle_input(update.callback_query.data, (update, context))
 
+        def inline_handler(update: Update, context: CallbackContext):
+            inline_query = update.inline_query
+            chat_handler = self.get_chat_handler(Chat(inline_query.from_user.id, Chat.PRIVATE))
+            inline_query.answer(
+                list(map(
+                    lambda found: InlineQueryResultArticle(
+                        id=found[0],
+                        title=found[1],
+                        input_message_content=InputTextMessageContent(found[1])
+                    ),
+                    chat_handler.handle_inline_query(inline_query.query)
+                )),
+                cache_time=0,
+                is_personal=True
+            )
+
         for command_of_handler in all_commands:
             self.dispatcher.add_handler(telegram.ext.CommandHandler(
                 command_of_handler,
-                command_wrapper(command_of_handler)
+                self.in_chat_lane(command_wrapper(command_of_handler))
             ))
 
         self.dispatcher.add_handler(MessageHandler(
             Filters.text & (~Filters.command),
-            user_message_handler
+            self.in_chat_lane(user_message_handler)
         ))
 
         self.dispatcher.add_handler(CallbackQueryHandler(
-            query_handler
+            self.in_chat_lane(query_handler)
         ))
 
-    def run(self):
-        if self.config.use_webhook:
-
-            kwargs = {
-                'url_path': self.config.telegram_bot_token,
-                'webhook_url': f'{self.config.host_url}/{self.config.telegram_bot_token}'
-            }
-            log.LOGGER.info(f'Run bot with webhook: {kwargs}')
-            self.updater.start_webhook(**kwargs)
+        self.dispatcher.add_handler(InlineQueryHandler(
+            self.in_chat_lane(inline_handler)
+        ))
+
+    def in_chat_lane(self, callback: Callable[[Update, CallbackContext], None]) -> Callable[[Update, CallbackContext], None]:
+        lanes = self.runtime if self.runtime is not None else self.chat_dispatcher
+
+        def submit(update: Update, context: CallbackContext):
+            self.answer_query(update)
+            if not self.admission.admit(update):
+                return
+            job = lambda: self.admission.run(update, lambda: callback(update, context))
+            if lanes is None:
+                job()
+            else:
+                lanes.submit(update_chat_id(update), job)
+
+        return submit
+
+    def __send_async(self, chat_id: int, method: str, kwargs: Dict):
+        return self.send_scheduler.run_async(
+            chat_id,
+            SendPriority.INTERACTIVE,
+            lambda: self.async_api.call(method, **kwargs)
+        )
+
+    async def __close_async(self) -> None:
+        self.async_api.close()
+
+    def answer_query(self, update: Update) -> None:
+        if update.callback_query is None:
+            return
+        with self.shed_answers_lock:
+            saturated = self.shed_answers_pending >= MAX_PENDING_SHED_ANSWERS
+            if not saturated:
+                self.shed_answers_pending += 1
+        if saturated:
+            self.acknowledge_query(update)
+            return
+
+        def answer():
+            try:
+                self.acknowledge_query(update)
+            finally:
+                with self.shed_answers_lock:
+                    self.shed_answers_pending -= 1
+
+        self.shed_answers.submit(answer)
+
+    def acknowledge_query(self, update: Update) -> None:
+        try:
+            update.callback_query.answer(text=self.config.callback_toast)
+        except TelegramError as e:
+            log.LOGGER.warning(f'Can not answer callback query {update.callback_query.id}: {e}')
+
+    def get_chat_handler(self, chat: Chat) -> CommandHandler:
+        with self.all_chats_lock:
+            if chat.id not in self.all_chats:
+                self.all_chats[chat.id] = self.command_handler_producer(chat)
+            return self.all_chats[chat.id]
+
+    def notify_status(self, chat_id: int, submission_id: str, status: str) -> None:
+        ring = self.shard_ring
+        if ring is not None and ring.shard_for(chat_id) != self.shard:
+            self.shard_forwards.put(('status', chat_id, submission_id, status))
+            return
+        chat_handler = self.get_chat_handler(Chat(chat_id, Chat.PRIVATE))
+        chat_handler.handle_status_update(submission_id, status, self.bulk_bot)
+
+    def not_ready_dependencies(self) -> List[str]:
+        return list(map(
+            lambda check: check[0],
+            filter(lambda check: not check[1](), self.readiness_checks.items())
+        ))
+
+    def is_ready(self) -> bool:
+        return not self.not_ready_dependencies()
+
+    def __start_delivery(self) -> None:
+        not_ready = self.not_ready_dependencies()
+        if not_ready:
+            log.LOGGER.info(f'Start bot before dependencies are ready: {not_ready}')
+        if self.chat_dispatcher is not None:
+            log.LOGGER.info(f'Run bot handlers on {self.config.dispatch_workers} chat dispatch workers')
+            self.chat_dispatcher.start()
+        if self.runtime is None:
+            self.outbound.start()
         else:
-            log.LOGGER.info(f'Run bot with long pooling')
-            self.updater.start_polling()
-        self.updater.idle()
+            log.LOGGER.info('Run outbound delivery on the asyncio runtime, handlers and result sinks on its executor threads')
+            self.runtime.start()
+            self.outbound.start_async(self.runtime.loop, self.__send_async)
+
+    def __drain_handlers(self) -> None:
+        if self.chat_dispatcher is not None:
+            self.chat_dispatcher.drain(timeout=10.0)
+        if self.runtime is not None:
+            self.runtime.drain(timeout=10.0)
+
+    def __stop_delivery(self) -> None:
+        if self.chat_dispatcher is not None:
+            self.chat_dispatcher.stop()
+        if self.runtime is not None:
+            self.runtime.drain(timeout=10.0)
+        self.outbound.stop()
+        for adopted in filter(lambda pipeline: not pipeline.stopped.is_set(), self.adopted_outbound):
+            adopted.stop(timeout=1.0)
+        if self.runtime is not None:
+            self.runtime.stop(before_stop=self.__close_async)
+        log.LOGGER.info(f'Update deduplication stats: {self.deduplicator.stats()}')
+        self.shed_answers.shutdown(wait=False)
+        log.LOGGER.info(f'Inbound admission stats: {self.admission.stats()}')
+        log.LOGGER.info(f'Telegram connection pool stats: {self.bot.request.stats()}')
+
+    def run(self):
+        self.__start_delivery()
+        serve_updates(self.updater, self.config)
+        self.__stop_delivery()
+
+    def adopt_outbound(self, path: Path) -> None:
+        adopted = OutboundPipeline(self.bot, path, workers=1)
+        if not adopted.store.pending():
+            adopted.store.close()
+            return
+        self.adopted_outbound.append(adopted.start())
+
+        def deliver_adopted():
+            while not adopted.drain(timeout=60.0):
+                if adopted.stopped.is_set():
+                    return
+                log.LOGGER.warning(f'Adopted outbound pipeline {path} still has {adopted.pending_count()} operations')
+            adopted.stop()
+            log.LOGGER.info(f'Adopted outbound pipeline {path} is delivered')
+
+        threading.Thread(target=deliver_adopted, name='tg-send-adopted', daemon=True).start()
+
+    def __adopt_shard(self, shard: int, retired: int) -> None:
+        if self.shard_adopter is None:
+            log.LOGGER.warning(f'Shard {shard} can not adopt the outboxes of retired shard {retired}')
+            return
+        try:
+            self.shard_adopter(retired)
+            log.LOGGER.info(f'Shard {shard} adopted the outboxes of retired shard {retired}')
+        except Exception as e:
+            log.LOGGER.error(f'Shard {shard} failed to adopt the outboxes of retired shard {retired}: {e}')
+
+    def serve_shard(
+            self,
+            shard: int,
+            ring: HashRing,
+            inbox: multiprocessing.Queue,
+            acks: multiprocessing.Queue,
+            forwards: multiprocessing.Queue
+    ):
+        self.shard = shard
+        self.shard_ring = ring
+        self.shard_forwards = forwards
+        self.__start_delivery()
+        log.LOGGER.info(f'Serve shard {shard} of {ring.shards}')
+        while True:
+            message = inbox.get()
+            if message[0] == 'update':
+                self.dispatcher.process_update(Update.de_json(message[1], self.bot))
+            elif message[0] == 'adopt':
+                self.__adopt_shard(shard, message[1])
+            elif message[0] == 'status':
+                self.notify_status(*message[1:])
+            elif message[0] == 'rebalance':
+                ring = HashRing(message[1])
+                self.shard_ring = ring
+                self.__drain_handlers()
+                with self.all_chats_lock:
+                    moved = list(filter(lambda chat_id: ring.shard_for(chat_id) != shard, self.all_chats))
+                    for chat_id in moved:
+                        del self.all_chats[chat_id]
+                log.LOGGER.info(f'Shard {shard} released {len(moved)} chats after rebalancing to {ring.shards}')
+                acks.put((shard, 'rebalance'))
+            elif message[0] == 'stop':
+                break
+        self.__stop_delivery()
+        acks.put((shard, 'stop'))
@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict
+
+from telegram import Update
+from telegram.ext import CallbackContext, DispatcherHandlerStop, TypeHandler
+
+from ua_help.common.log import LOGGER
+
+
+class UpdateDeduplicator:
+    def __init__(self, path: Path, window: int = 1024):
+        self.path = path
+        self.window = window
+        self.mask = (1 << window) - 1
+        self.lock = threading.Lock()
+        self.high_water = -1
+        self.seen_bits = 0
+        self.accepted_count = 0
+        self.duplicate_count = 0
+        self.reset_count = 0
+        self.__load()
+
+    def __load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            state = json.loads(self.path.read_text())
+            self.high_water = int(state['high_water'])
+            self.seen_bits = int(state['seen'], 16) & self.mask
+        except (ValueError, KeyError) as e:
+            LOGGER.warning(f'Can not load update deduplication state from {self.path}: {e}')
+            return
+        LOGGER.info(f'Deduplicate updates after update_id {self.high_water}')
+
+    def __persist(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(f'{self.path.suffix}.tmp')
+        temporary.write_text(json.dumps({'high_water': self.high_water, 'seen': f'{self.seen_bits:x}'}))
+        os.replace(temporary, self.path)
+
+    def accept(self, update_id: int) -> bool:
+        with self.lock:
+            if update_id > self.high_water:
+                shift = update_id - self.high_water
+                self.seen_bits = ((self.seen_bits << shift) | 1) & self.mask if shift < self.window else 1
+                self.high_water = update_id
+            else:
+                offset = self.high_water - update_id
+                if offset >= self.window:
+                    LOGGER.warning(f'update_id {update_id} is far below {self.high_water}, restart deduplication window')
+                    self.reset_count += 1
+                    self.high_water = update_id
+                    self.seen_bits = 1
+                elif self.seen_bits >> offset & 1:
+                    self.duplicate_count += 1
+                    return False
+                else:
+                    self.seen_bits |= 1 << offset
+            self.accepted_count += 1
+            self.__persist()
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                'high_water': self.high_water,
+                'accepted': self.accepted_count,
+                'duplicates': self.duplicate_count,
+                'resets': self.reset_count
+            }
+
+
+def dedup_handler(deduplicator: UpdateDeduplicator) -> TypeHandler:
+    def drop_duplicate(update: Update, context: CallbackContext):
+        if not deduplicator.accept(update.update_id):
+            LOGGER.info(f'Drop duplicate update {update.update_id}')
+            raise DispatcherHandlerStop()
+
+    return TypeHandler(Update, drop_duplicate)
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import queue
+import signal
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import tornado.ioloop
+import tornado.web
+from telegram import Update
+from telegram.ext import Dispatcher
+from tornado.httpserver import HTTPServer
+
+from ua_help.common.log import LOGGER
+
+MAX_BODY_SIZE = 1024 * 1024
+QueuedUpdate = Tuple[float, Dict[str, Any]]
+
+
+class IngressHandler(tornado.web.RequestHandler):
+    def initialize(self, ingress: 'WebhookIngress'):
+        self.ingress = ingress
+
+    def post(self):
+        started = time.perf_counter()
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or not isinstance(data.get('update_id'), int):
+            self.ingress.record_invalid()
+            self.set_status(400)
+        elif not self.ingress.offer(data):
+            self.set_status(429)
+            self.set_header('Retry-After', str(self.ingress.retry_after))
+        self.finish()
+        self.ingress.record_ack(time.perf_counter() - started)
+
+
+class IngressStatsHandler(tornado.web.RequestHandler):
+    def initialize(self, ingress: 'WebhookIngress'):
+        self.ingress = ingress
+
+    def get(self):
+        self.write(self.ingress.stats())
+
+
+class WebhookIngress:
+    def __init__(
+            self,
+            dispatcher: Dispatcher,
+            url_path: str,
+            listen: str = '127.0.0.1',
+            port: int = 80,
+            max_queue: int = 1000,
+            retry_after: int = 1,
+            stats_interval: Optional[float] = 60.0
+    ):
+        self.dispatcher = dispatcher
+        self.url_path = url_path
+        self.listen = listen
+        self.port = port
+        self.retry_after = retry_after
+        self.stats_interval = stats_interval
+        self.updates: 'queue.Queue[Optional[QueuedUpdate]]' = queue.Queue(maxsize=max_queue)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server: Optional[HTTPServer] = None
+        self.started = threading.Event()
+        self.stopped = threading.Event()
+        self.server_thread = threading.Thread(target=self.__serve, name='tg-webhook-ingress', daemon=True)
+        self.consumer_thread = threading.Thread(target=self.__consume, name='tg-webhook-consumer', daemon=True)
+        self.stats_lock = threading.Lock()
+        self.accepted_count = 0
+        self.rejected_count = 0
+        self.invalid_count = 0
+        self.processed_count = 0
+        self.max_ack_seconds = 0.0
+        self.total_ack_seconds = 0.0
+
+    def __serve(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        app = tornado.web.Application([
+            (rf'/{self.url_path}/?', IngressHandler, {'ingress': self}),
+            (rf'/{self.url_path}/stats/?', IngressStatsHandler, {'ingress': self})
+        ])
+        self.server = HTTPServer(app, max_body_size=MAX_BODY_SIZE)
+        self.server.listen(self.port, self.listen)
+        if self.stats_interval:
+            tornado.ioloop.PeriodicCallback(
+                lambda: LOGGER.info(f'Webhook ingress stats: {self.stats()}'),
+                self.stats_interval * 1000
+            ).start()
+        self.started.set()
+        self.loop.run_forever()
+
+    def __consume(self) -> None:
+        while True:
+            item = self.updates.get()
+            if item is None:
+                return
+            try:
+                self.dispatcher.process_update(Update.de_json(item[1], self.dispatcher.bot))
+            except Exception as e:
+                LOGGER.error(f'Can not process webhook update {item[1].get("update_id")}: {e}')
+            with self.stats_lock:
+                self.processed_count += 1
+
+    def start(self) -> 'WebhookIngress':
+        self.consumer_thread.start()
+        self.server_thread.start()
+        self.started.wait()
+        LOGGER.info(f'Webhook ingress listens on {self.listen}:{self.port}')
+        return self
+
+    def offer(self, data: Dict[str, Any]) -> bool:
+        try:
+            self.updates.put_nowait((time.monotonic(), data))
+        except queue.Full:
+            with self.stats_lock:
+                self.rejected_count += 1
+            return False
+        with self.stats_lock:
+            self.accepted_count += 1
+        return True
+
+    def record_invalid(self) -> None:
+        with self.stats_lock:
+            self.invalid_count += 1
+
+    def record_ack(self, seconds: float) -> None:
+        with self.stats_lock:
+            self.max_ack_seconds = max(self.max_ack_seconds, seconds)
+            self.total_ack_seconds += seconds
+
+    def oldest_age(self) -> float:
+        with self.updates.mutex:
+            oldest = next(iter(self.updates.queue), None)
+        return 0.0 if oldest is None else time.monotonic() - oldest[0]
+
+    def stats(self) -> Dict[str, float]:
+        with self.stats_lock:
+            answered = self.accepted_count + self.rejected_count + self.invalid_count
+            return {
+                'depth': self.updates.qsize(),
+                'oldest_age': self.oldest_age(),
+                'accepted': self.accepted_count,
+                'rejected': self.rejected_count,
+                'invalid': self.invalid_count,
+                'processed': self.processed_count,
+                'ack_avg_us': self.total_ack_seconds / answered * 1e6 if answered else 0.0,
+                'ack_max_us': self.max_ack_seconds * 1e6
+            }
+
+    def idle(self) -> None:
+        def stop(signum, frame):
+            LOGGER.info(f'Received signal {signum}, stop webhook ingress')
+            self.stopped.set()
+
+        for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGABRT):
+            signal.signal(signum, stop)
+        self.stopped.wait()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.server.stop)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.server_thread.join(timeout=1.0)
+        self.updates.put(None)
+        self.consumer_thread.join(timeout=timeout)
+        if self.consumer_thread.is_alive():
+            LOGGER.warning(f'Webhook ingress stopped with {self.updates.qsize()} updates left unprocessed')
+        LOGGER.info(f'Webhook ingress stats: {self.stats()}')